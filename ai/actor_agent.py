@@ -0,0 +1,72 @@
+import torch
+import random
+import numpy as np
+from .agent import DQN, epsilon_greedy_actions
+from .numpy_policy import NumpyPolicy
+from .quantization import quantize_policy
+
+# Acting-only copy of the DQN policy. It has no optimizer or replay buffer;
+# transitions are handed to transition_sink (e.g. a shared-memory ring that
+# feeds a learner process) and weights are refreshed from outside.
+class ActorAgent:
+    def __init__(self, settings, epsilon=0.0, transition_sink=None):
+        self.settings = settings
+        self.device = torch.device("cpu")
+        self.policy_net = DQN(8, 3, settings.hidden_size).to(self.device)
+        self.policy_net.eval()
+        for param in self.policy_net.parameters():
+            param.requires_grad_(False)
+        self.epsilon = epsilon
+        self.transition_sink = transition_sink
+        self.last_reward = None
+        self.numpy_policy = None
+        if settings.inference_backend == "numpy":
+            self.numpy_policy = NumpyPolicy()
+            self.numpy_policy.bind_network(self.policy_net)
+        # With the "int8" backend the forward pass runs on a dynamically quantized
+        # copy of policy_net, rebuilt whenever new weights are loaded
+        self.quantized = settings.inference_backend == "int8"
+        self.acting_net = quantize_policy(self.policy_net) if self.quantized else self.policy_net
+
+    def get_action(self, state):
+        if random.random() < self.epsilon:
+            return random.choice([0, 1, 2])  # 0: stay, 1: up, 2: down
+        if self.numpy_policy is not None:
+            return self.numpy_policy.get_action(state)
+        with torch.no_grad():
+            state_tensor = torch.FloatTensor(state).unsqueeze(0)
+            q_values = self.acting_net(state_tensor)
+            return q_values.max(1)[1].item()
+
+    def get_actions(self, states):
+        return epsilon_greedy_actions(self.epsilon, states, self.greedy_actions)
+
+    def greedy_actions(self, states):
+        if self.numpy_policy is not None:
+            return self.numpy_policy.get_actions(states)
+        with torch.no_grad():
+            state_tensor = torch.from_numpy(np.asarray(states, dtype=np.float32))
+            return self.acting_net(state_tensor).max(1)[1].tolist()
+
+    def update(self, state, action, reward, next_state):
+        self.last_reward = reward
+        if self.transition_sink is not None:
+            self.transition_sink(state, action, reward, next_state)
+
+    def load_state_dict(self, state_dict):
+        self.policy_net.load_state_dict(state_dict)
+        if self.quantized:
+            self.acting_net = quantize_policy(self.policy_net)
+
+    def load_parameter_vector(self, vector):
+        torch.nn.utils.vector_to_parameters(vector, self.policy_net.parameters())
+        if self.numpy_policy is not None:
+            self.numpy_policy.bind_network(self.policy_net)  # The parameters now live in new tensors
+        if self.quantized:
+            self.acting_net = quantize_policy(self.policy_net)
+
+    def get_network_activations(self, state, row=0):
+        with torch.no_grad():
+            state_tensor = torch.FloatTensor(state).unsqueeze(0)
+            self.policy_net(state_tensor)
+            return self.policy_net.activations
@@ -4,6 +4,10 @@ import torch.optim as optim
 import random
 import numpy as np
 from collections import deque
+from .segment_tree import SumSegmentTree, MinSegmentTree
+from .numpy_policy import NumpyPolicy
+from .replay_storage import MemmapReplayStorage
+from utils.profiler import profiler
 
 class DQN(nn.Module):
     def __init__(self, input_size, output_size, hidden_size):
@@ -23,18 +27,28 @@ class DQN(nn.Module):
         self.activations.append(x.detach())
         return x
 
+def epsilon_greedy_actions(epsilon, states, greedy_actions):
+    # Epsilon-greedy for several observations. greedy_actions(states) runs one
+    # batched forward pass and is skipped when every observation explores.
+    explore = [random.random() < epsilon for _ in states]
+    if all(explore):
+        return [random.choice([0, 1, 2]) for _ in states]
+    greedy = greedy_actions(states)
+    return [random.choice([0, 1, 2]) if random_action else action for random_action, action in zip(explore, greedy)]
+
 class Agent:
+    agent_type = "dqn"
+
     def __init__(self, settings):
         self.settings = settings
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        hidden_size = int(min(settings.width, settings.height) * 0.1)
-        self.policy_net = DQN(8, 3, hidden_size).to(self.device)
-        self.target_net = DQN(8, 3, hidden_size).to(self.device)
+        self.policy_net = DQN(8, 3, settings.hidden_size).to(self.device)
+        self.target_net = DQN(8, 3, settings.hidden_size).to(self.device)
         self.target_net.load_state_dict(self.policy_net.state_dict())
         self.target_net.eval()
 
         self.optimizer = optim.Adam(self.policy_net.parameters(), lr=0.001)
-        self.memory = PrioritizedReplayBuffer(capacity=10000, alpha=0.6)
+        self._memory = None
         self.batch_size = 64
         self.gamma = 0.99
         self.initial_epsilon = 1.0
@@ -51,64 +65,199 @@ class Agent:
         self.beta = 0.4
         self.beta_increment = 0.001
         self.last_reward = None
+        self.last_activations = None
+        self.pending_priority_indices = []
+        self.steps = 0
+        self.numpy_policy = None
+        self.numpy_policy_stale = True
+        self.apply_settings(settings)
+
+    @property
+    def memory(self):
+        # Built on first use, so a buffer that moves onto replay storage (or an agent
+        # that never learns) never allocates a full-capacity buffer in RAM
+        if self._memory is None:
+            self._memory = PrioritizedReplayBuffer(capacity=self.settings.replay_capacity, alpha=0.6)
+        return self._memory
+
+    @memory.setter
+    def memory(self, memory):
+        self._memory = memory
 
     def get_action(self, state):
         if random.random() < self.epsilon:
+            self.last_activations = None
             return random.choice([0, 1, 2])  # 0: stay, 1: up, 2: down
+        elif self.numpy_policy is not None:
+            q_values = self.get_numpy_policy().forward((state,))
+            self.last_activations = self.numpy_policy.activations
+            return int(q_values[0].argmax())
         else:
             with torch.no_grad():
                 state_tensor = torch.FloatTensor(state).unsqueeze(0).to(self.device)
                 q_values = self.policy_net(state_tensor)
+                self.last_activations = self.policy_net.activations
                 return q_values.max(1)[1].item()
 
+    def get_actions(self, states):
+        self.last_activations = None  # Stays None when every observation explores
+        return epsilon_greedy_actions(self.epsilon, states, self.greedy_actions)
+
+    def greedy_actions(self, states):
+        if self.numpy_policy is not None:
+            actions = self.get_numpy_policy().get_actions(states)
+            self.last_activations = self.numpy_policy.activations
+            return actions
+        with torch.no_grad():
+            state_tensor = torch.from_numpy(np.asarray(states, dtype=np.float32)).to(self.device)
+            actions = self.policy_net(state_tensor).max(1)[1].tolist()
+            self.last_activations = self.policy_net.activations
+            return actions
+
+    def apply_settings(self, settings):
+        # Replay, learner schedule and acting backend; called again when a resumed
+        # run overrides the settings saved with the checkpoint
+        self.priority_mode = settings.priority_mode
+        self.priority_update_interval = settings.priority_update_interval
+        self.train_frequency = settings.train_frequency
+        self.gradient_steps = settings.gradient_steps
+        self.target_update_mode = settings.target_update_mode
+        self.target_update_interval = settings.target_update_interval
+        self.tau = settings.tau
+        if settings.inference_backend != "numpy":
+            self.numpy_policy = None
+        elif self.numpy_policy is None:
+            self.numpy_policy = NumpyPolicy()
+            self.numpy_policy_stale = True
+
     def update(self, state, action, reward, next_state):
-        # Calculate the TD error for prioritization
-        state_tensor = torch.FloatTensor(state).unsqueeze(0).to(self.device)
-        next_state_tensor = torch.FloatTensor(next_state).unsqueeze(0).to(self.device)
-        
-        current_q = self.policy_net(state_tensor).gather(1, torch.tensor([[action]]).to(self.device)).item()
-        next_q = self.target_net(next_state_tensor).max(1)[0].item()
-        expected_q = reward + self.gamma * next_q
-        
-        td_error = abs(current_q - expected_q)
-        
         self.last_reward = reward
-        # Make sure to update self.last_reward before adding to memory
-        self.memory.add(td_error, (state, action, reward, next_state))
+        start = profiler.start()
+        # New transitions get the max priority so they are replayed at least once;
+        # their real TD error is written back when the learner samples them
+        index = self.memory.add(self.memory.max_priority, (state, action, reward, next_state))
 
+        if self.priority_mode == "batched":
+            self.pending_priority_indices.append(index)
+            if len(self.pending_priority_indices) >= self.priority_update_interval:
+                self.update_pending_priorities()
+        profiler.stop("agent.replay_insert", start)
+
+        self.steps += 1
         if len(self.memory) < self.batch_size:
             return
 
+        if self.steps % self.train_frequency == 0:
+            start = profiler.start()
+            for _ in range(self.gradient_steps):
+                self.learn()
+            profiler.stop("agent.learn", start)
+
+        self.sync_target_network(self.steps)
+
+        self.dynamic_epsilon_decay(reward)
+
+    def learn(self):
         # Sample a batch of experiences based on their priorities
+        start = profiler.start()
         batch, indices, weights = self.memory.sample(self.batch_size, self.beta)
-        states, actions, rewards, next_states = zip(*batch)
+        states, actions, rewards, next_states = batch
+
+        # The sampled arrays are already contiguous, so these wrap them without copying
+        states = torch.from_numpy(states).to(self.device)
+        actions = torch.from_numpy(actions).long().to(self.device)
+        rewards = torch.from_numpy(rewards).to(self.device)
+        next_states = torch.from_numpy(next_states).to(self.device)
+        weights = torch.from_numpy(weights).to(self.device)
+        profiler.stop("learn.sample", start)
+
+        start = profiler.start()
+        loss, td_errors = self.train_on_batch(states, actions, rewards, next_states, weights)
+        profiler.stop("learn.backprop", start)
+
+        # Update priorities in the replay buffer
+        start = profiler.start()
+        self.memory.update(indices, td_errors.cpu().numpy())
+        profiler.stop("learn.priority_update", start)
+
+        # Increase beta for importance sampling
+        self.beta = min(1.0, self.beta + self.beta_increment)
 
-        states = torch.FloatTensor(states).to(self.device)
-        actions = torch.LongTensor(actions).to(self.device)
-        rewards = torch.FloatTensor(rewards).to(self.device)
-        next_states = torch.FloatTensor(next_states).to(self.device)
-        weights = torch.FloatTensor(weights).to(self.device)
+    def use_replay_storage(self, path):
+        # Moves the replay buffer onto memory-mapped files under path, reopening
+        # whatever a previous run flushed there. An empty storage is seeded with the
+        # transitions already in memory (e.g. from an older checkpoint).
+        previous = self._memory
+        if previous is None:
+            storage = MemmapReplayStorage(path, self.settings.replay_capacity)
+            self.memory = PrioritizedReplayBuffer(self.settings.replay_capacity, 0.6, storage=storage)
+            return
+        if previous.storage is not None and previous.storage.path == path:
+            return
+        storage = MemmapReplayStorage(path, previous.capacity, previous.states.shape[1])
+        memory = PrioritizedReplayBuffer(previous.capacity, previous.alpha, previous.states.shape[1], previous.epsilon, storage)
+        if len(memory) == 0 and len(previous) > 0:
+            memory.load_state_dict(previous.state_dict())
+        self.memory = memory
 
+    def compute_loss(self, states, actions, rewards, next_states, weights):
+        # TD loss for train_on_batch(); returns the loss and the absolute TD error
+        # of every transition
         current_q_values = self.policy_net(states).gather(1, actions.unsqueeze(1))
         next_q_values = self.target_net(next_states).max(1)[0].detach()
         expected_q_values = rewards + (self.gamma * next_q_values)
 
         # Calculate loss with importance sampling weights
         loss = (weights * nn.functional.smooth_l1_loss(current_q_values, expected_q_values.unsqueeze(1), reduction='none')).mean()
+        td_errors = abs(current_q_values - expected_q_values.unsqueeze(1)).detach()
+        return loss, td_errors[:, 0]
 
+    def train_on_batch(self, states, actions, rewards, next_states, weights):
+        # One optimizer step plus the bookkeeping that follows every gradient step;
+        # shared by learn() and offline_train.py. Returns the loss and TD errors.
+        loss, td_errors = self.compute_loss(states, actions, rewards, next_states, weights)
         self.optimizer.zero_grad()
         loss.backward()
         self.optimizer.step()
+        if self.numpy_policy is not None and not self.numpy_policy.bound:
+            self.numpy_policy_stale = True
+        if self.target_update_mode == "soft":
+            self.soft_update_target_network()
+        return loss, td_errors
 
-        # Update priorities in the replay buffer
-        td_errors = abs(current_q_values - expected_q_values.unsqueeze(1)).detach().cpu().numpy()
-        for i, td_error in zip(indices, td_errors):
-            self.memory.update(i, td_error[0])
+    def sync_target_network(self, step):
+        # Hard target sync every target_update_interval steps, counted in whatever
+        # unit the caller trains by (env steps online, learner or gradient steps otherwise)
+        if self.target_update_mode == "hard" and step % self.target_update_interval == 0:
+            self.update_target_network()
 
-        self.dynamic_epsilon_decay(reward)
+    def get_numpy_policy(self):
+        # Refreshed lazily on the next action. On CPU the policy is bound to
+        # policy_net's parameters, which optimizer steps update in place, so it is
+        # only rebuilt after loading; on GPU the snapshot is re-copied after learning.
+        if self.numpy_policy_stale:
+            if self.device.type == "cpu":
+                self.numpy_policy.bind_network(self.policy_net)
+            else:
+                self.numpy_policy.load_network(self.policy_net)
+            self.numpy_policy_stale = False
+        return self.numpy_policy
 
-        # Increase beta for importance sampling
-        self.beta = min(1.0, self.beta + self.beta_increment)
+    def update_pending_priorities(self):
+        # One batched TD pass for every transition inserted since the last call
+        indices = np.array(self.pending_priority_indices)
+        self.pending_priority_indices.clear()
+        with torch.no_grad():
+            states = torch.from_numpy(self.memory.states[indices]).to(self.device)
+            actions = torch.from_numpy(self.memory.actions[indices]).long().to(self.device)
+            rewards = torch.from_numpy(self.memory.rewards[indices]).to(self.device)
+            next_states = torch.from_numpy(self.memory.next_states[indices]).to(self.device)
+
+            current_q_values = self.policy_net(states).gather(1, actions.unsqueeze(1)).squeeze(1)
+            next_q_values = self.target_net(next_states).max(1)[0]
+            expected_q_values = rewards + (self.gamma * next_q_values)
+            td_errors = abs(current_q_values - expected_q_values).cpu().numpy()
+        self.memory.update(indices, td_errors)
 
     def dynamic_epsilon_decay(self, reward):
         # Add the latest performance (1 for positive reward, 0 for negative)
@@ -127,7 +276,43 @@ class Agent:
     def update_target_network(self):
         self.target_net.load_state_dict(self.policy_net.state_dict())
 
-    def get_network_activations(self, state):
+    def soft_update_target_network(self):
+        # Polyak averaging: target = tau * policy + (1 - tau) * target
+        with torch.no_grad():
+            for target_param, policy_param in zip(self.target_net.parameters(), self.policy_net.parameters()):
+                target_param.mul_(1 - self.tau).add_(policy_param, alpha=self.tau)
+
+    def state_dict(self):
+        return {
+            'policy_net': self.policy_net.state_dict(),
+            'target_net': self.target_net.state_dict(),
+            'optimizer': self.optimizer.state_dict(),
+            'epsilon': self.epsilon,
+            'beta': self.beta,
+            'steps': self.steps,
+            'rebounds': self.rebounds,
+            'last_reward': self.last_reward,
+            'performance_window': list(self.performance_window),
+        }
+
+    def load_state_dict(self, state_dict):
+        self.policy_net.load_state_dict(state_dict['policy_net'])
+        self.target_net.load_state_dict(state_dict['target_net'])
+        self.optimizer.load_state_dict(state_dict['optimizer'])
+        self.epsilon = state_dict['epsilon']
+        self.beta = state_dict['beta']
+        self.steps = state_dict['steps']
+        self.rebounds = state_dict['rebounds']
+        self.last_reward = state_dict['last_reward']
+        self.performance_window.clear()
+        self.performance_window.extend(state_dict['performance_window'])
+        self.numpy_policy_stale = True
+
+    def get_network_activations(self, state, row=0):
+        # Reuse the activations of the last acting forward pass when there was one;
+        # row picks the observation within a batched get_actions call
+        if self.last_activations is not None and row < len(self.last_activations[0]):
+            return [layer[row:row + 1] for layer in self.last_activations]
         with torch.no_grad():
             state_tensor = torch.FloatTensor(state).unsqueeze(0).to(self.device)
             self.policy_net(state_tensor)
@@ -148,41 +333,127 @@ class Agent:
         self.rebounds = 0
 
 class PrioritizedReplayBuffer:
-    def __init__(self, capacity, alpha):
+    def __init__(self, capacity, alpha, state_size=8, epsilon=1e-6, storage=None):
         self.capacity = capacity
         self.alpha = alpha
-        self.buffer = []
-        self.priorities = np.zeros((capacity,), dtype=np.float32)
+        self.epsilon = epsilon  # Keeps zero-error transitions sampleable
+        self.storage = storage
+        # Transitions live in preallocated contiguous arrays, one row per slot;
+        # with a MemmapReplayStorage they are memory-mapped files instead
+        if storage is None:
+            self.states = np.zeros((capacity, state_size), dtype=np.float32)
+            self.actions = np.zeros((capacity,), dtype=np.int8)
+            self.rewards = np.zeros((capacity,), dtype=np.float32)
+            self.next_states = np.zeros((capacity, state_size), dtype=np.float32)
+        else:
+            self.states = storage.states
+            self.actions = storage.actions
+            self.rewards = storage.rewards
+            self.next_states = storage.next_states
+        self.size = 0
         self.position = 0
+        self.max_priority = 1.0
+        # Priorities are stored as p ** alpha; the min tree gives the largest IS weight
+        self.sum_tree = SumSegmentTree(capacity)
+        self.min_tree = MinSegmentTree(capacity)
+
+        saved = storage.load_priorities() if storage is not None else None
+        if saved is not None:
+            priorities, self.size, self.position, self.max_priority = saved
+            self.sum_tree.build(priorities)
+            self.min_tree.build(priorities)
 
     def add(self, priority, experience):
-        if len(self.buffer) < self.capacity:
-            self.buffer.append(experience)
-        else:
-            self.buffer[self.position] = experience
-        self.priorities[self.position] = priority
+        state, action, reward, next_state = experience
+        self.states[self.position] = state
+        self.actions[self.position] = action
+        self.rewards[self.position] = reward
+        self.next_states[self.position] = next_state
+        index = self.position
+        self.update(index, priority)
         self.position = (self.position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return index
+
+    def add_batch(self, priority, states, actions, rewards, next_states):
+        # Vectorized add for a whole block of transitions sharing one priority
+        count = len(states)
+        if count > self.capacity:
+            states, actions, rewards, next_states = states[-self.capacity:], actions[-self.capacity:], rewards[-self.capacity:], next_states[-self.capacity:]
+            count = self.capacity
+        indices = (self.position + np.arange(count)) % self.capacity
+        self.states[indices] = states
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_states[indices] = next_states
+        self.update(indices, np.full(count, priority))
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+        return indices
 
     def sample(self, batch_size, beta):
-        if len(self.buffer) == self.capacity:
-            priorities = self.priorities
-        else:
-            priorities = self.priorities[:self.position]
+        total = self.size
+        priority_sum = self.sum_tree.sum()
+
+        # Stratified sampling: one prefix sum drawn from each of batch_size equal segments
+        segment = priority_sum / batch_size
+        prefixsums = (np.arange(batch_size) + np.random.uniform(size=batch_size)) * segment
+        indices = self.sum_tree.find_prefixsum_idx(prefixsums)
+        np.minimum(indices, total - 1, out=indices)
+        # Fancy indexing gathers each field into a fresh contiguous array
+        samples = (self.states[indices], self.actions[indices], self.rewards[indices], self.next_states[indices])
+
+        probabilities = self.sum_tree[indices] / priority_sum
+        min_probability = self.min_tree.min() / priority_sum
+        max_weight = (total * min_probability) ** (-beta)
+        weights = (total * probabilities) ** (-beta) / max_weight
+
+        return samples, indices, weights.astype(np.float32)
 
-        probabilities = priorities ** self.alpha
-        probabilities /= probabilities.sum()
+    def update(self, indices, priorities):
+        # Accepts a single index or whole batches of indices and priorities
+        indices = np.atleast_1d(indices)
+        priorities = np.atleast_1d(np.asarray(priorities, dtype=np.float64))
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        scaled = (priorities + self.epsilon) ** self.alpha
+        self.sum_tree.update(indices, scaled)
+        self.min_tree.update(indices, scaled)
 
-        indices = np.random.choice(len(self.buffer), batch_size, p=probabilities)
-        samples = [self.buffer[idx] for idx in indices]
+    def state_dict(self):
+        # Only the filled rows are kept; priorities are stored already scaled by alpha
+        indices = np.arange(self.size)
+        return {
+            'states': self.states[:self.size],
+            'actions': self.actions[:self.size],
+            'rewards': self.rewards[:self.size],
+            'next_states': self.next_states[:self.size],
+            'priorities': self.sum_tree[indices],
+            'position': self.position,
+            'max_priority': self.max_priority,
+        }
 
-        total = len(self.buffer)
-        weights = (total * probabilities[indices]) ** (-beta)
-        weights /= weights.max()
+    def load_state_dict(self, state_dict):
+        size = min(len(state_dict['states']), self.capacity)
+        self.states[:size] = state_dict['states'][:size]
+        self.actions[:size] = state_dict['actions'][:size]
+        self.rewards[:size] = state_dict['rewards'][:size]
+        self.next_states[:size] = state_dict['next_states'][:size]
+        self.sum_tree.build(state_dict['priorities'][:size])
+        self.min_tree.build(state_dict['priorities'][:size])
+        self.size = size
+        self.position = int(state_dict['position']) % self.capacity
+        self.max_priority = float(state_dict['max_priority'])
 
-        return samples, indices, weights
+    def storage_state(self):
+        # What a storage flush records next to the arrays, copied so the flush can
+        # run on another thread while the buffer keeps changing
+        leaves = self.sum_tree.capacity
+        return self.sum_tree.tree[leaves:leaves + self.size].copy(), self.size, self.position, self.max_priority
 
-    def update(self, index, priority):
-        self.priorities[index] = priority
+    def flush(self):
+        # Persists a storage-backed buffer so reopening its directory restores it
+        if self.storage is not None:
+            self.storage.flush(*self.storage_state())
 
     def __len__(self):
-        return len(self.buffer)
+        return self.size
@@ -1,12 +1,28 @@
-from .agent import Agent, PrioritizedReplayBuffer
-from .random_agent import RandomAgent
+import importlib
 
 class AIFactory:
-    @staticmethod
-    def create_agent(agent_type, settings):
-        if agent_type == "dqn":
-            return Agent(settings)
-        elif agent_type == "random":
-            return RandomAgent(settings)
-        else:
-            raise ValueError(f"Unknown agent type: {agent_type}")
+    # Agent backends are imported the first time they are requested, so sessions
+    # that never create a DQN agent do not pay for importing torch
+    registry = {
+        "dqn": ("ai.agent", "Agent"),
+        "random": ("ai.random_agent", "RandomAgent"),
+    }
+    loaded = {}
+
+    @classmethod
+    def register(cls, agent_type, module_name, class_name):
+        cls.registry[agent_type] = (module_name, class_name)
+        cls.loaded.pop(agent_type, None)
+
+    @classmethod
+    def get_agent_class(cls, agent_type):
+        if agent_type not in cls.loaded:
+            if agent_type not in cls.registry:
+                raise ValueError(f"Unknown agent type: {agent_type}")
+            module_name, class_name = cls.registry[agent_type]
+            cls.loaded[agent_type] = getattr(importlib.import_module(module_name), class_name)
+        return cls.loaded[agent_type]
+
+    @classmethod
+    def create_agent(cls, agent_type, settings):
+        return cls.get_agent_class(agent_type)(settings)
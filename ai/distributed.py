@@ -0,0 +1,240 @@
+import os
+import random
+import time
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from game.game_instance import GameInstance
+from game.checkpoint import find_latest_save, generation_number, load_agents, write_checkpoint
+from .agent import Agent
+from .actor_agent import ActorAgent
+
+STATE_SIZE = 8
+ROW_SIZE = 2 * STATE_SIZE + 2  # state, action, reward, next_state
+
+# Single-producer/single-consumer ring of transitions in shared memory.
+# The actor owns `head` and the learner owns `tail`; each only ever writes its
+# own counter, so no lock is needed. When the learner falls behind, new
+# transitions are dropped and counted rather than stalling the actor.
+class TransitionRing:
+    def __init__(self, ctx, capacity):
+        self.capacity = capacity
+        self.data = ctx.RawArray('f', capacity * ROW_SIZE)
+        self.head = ctx.RawValue('q', 0)
+        self.tail = ctx.RawValue('q', 0)
+        self.dropped = ctx.RawValue('q', 0)
+        self._rows = None
+
+    @property
+    def rows(self):
+        # Built lazily so the view is created inside whichever process uses it
+        if self._rows is None:
+            self._rows = np.frombuffer(self.data, dtype=np.float32).reshape(self.capacity, ROW_SIZE)
+        return self._rows
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_rows'] = None
+        return state
+
+    def push(self, state, action, reward, next_state):
+        head = self.head.value
+        if head - self.tail.value >= self.capacity:
+            self.dropped.value += 1
+            return
+        row = self.rows[head % self.capacity]
+        row[:STATE_SIZE] = state
+        row[STATE_SIZE] = action
+        row[STATE_SIZE + 1] = reward
+        row[STATE_SIZE + 2:] = next_state
+        self.head.value = head + 1  # Publish only after the row is fully written
+
+    def drain(self):
+        head = self.head.value
+        tail = self.tail.value
+        if head == tail:
+            return None
+        start = tail % self.capacity
+        end = head % self.capacity
+        if start < end:
+            block = self.rows[start:end].copy()
+        else:
+            block = np.concatenate((self.rows[start:], self.rows[:end]))
+        self.tail.value = head
+        return block
+
+# Flat float32 copy of the policy parameters plus a version counter. The
+# learner publishes under the lock and actors copy out whenever the version
+# they hold is stale.
+class SharedWeights:
+    def __init__(self, ctx, num_params):
+        self.data = ctx.RawArray('f', num_params)
+        self.version = ctx.RawValue('q', 0)
+        self.lock = ctx.Lock()
+
+    def publish(self, network):
+        vector = torch.nn.utils.parameters_to_vector(network.parameters()).detach().cpu().numpy()
+        with self.lock:
+            np.frombuffer(self.data, dtype=np.float32)[:] = vector
+            self.version.value += 1
+
+    def fetch(self, agent, known_version):
+        if self.version.value == known_version:
+            return known_version
+        with self.lock:
+            vector = torch.from_numpy(np.frombuffer(self.data, dtype=np.float32).copy())
+            version = self.version.value
+        agent.load_parameter_vector(vector)
+        return version
+
+def actor_loop(settings, ring, weights, epsilon, stop_event, weight_poll_interval, seed):
+    torch.set_num_threads(1)  # One core per actor; the learner owns the rest
+    torch.manual_seed(seed)
+    np.random.seed(seed)
+    random.seed(seed)
+
+    # Self-play: one policy copy drives both paddles and sees both sides' transitions
+    agent = ActorAgent(settings, epsilon=epsilon, transition_sink=ring.push)
+    version = weights.fetch(agent, 0)
+    instance = GameInstance(agent, agent, settings)
+
+    steps = 0
+    while not stop_event.is_set():
+        instance.update()
+        steps += 1
+        if steps % weight_poll_interval == 0:
+            version = weights.fetch(agent, version)
+
+class DistributedTrainer:
+    def __init__(self, settings, num_actors, save_directory="saves", autosave_interval=300,
+                 ring_capacity=65536, weight_sync_interval=50, weight_poll_interval=400,
+                 base_epsilon=0.4, epsilon_alpha=7.0, include_replay=True, resume=False, overrides=None):
+        self.num_actors = num_actors
+        self.save_directory = save_directory
+        self.autosave_interval = autosave_interval
+        self.ring_capacity = ring_capacity
+        self.weight_sync_interval = weight_sync_interval  # Learner steps between weight broadcasts
+        self.weight_poll_interval = weight_poll_interval  # Actor env steps between weight checks
+        self.include_replay = include_replay
+        self.generation = 1
+        os.makedirs(self.save_directory, exist_ok=True)
+
+        latest_save = find_latest_save(self.save_directory) if resume else None
+        if latest_save:
+            # The learner continues from the saved left-paddle agent; the actors
+            # always play self-play with copies of it
+            agent, _, header = load_agents(latest_save, include_replay)
+            if header['agent_types'][0] != Agent.agent_type:
+                raise ValueError(f"Cannot resume actor/learner training from a {header['agent_types'][0]} agent in {latest_save}")
+            if settings.replay_path and not agent.settings.replay_path:
+                agent.settings.replay_path = settings.replay_path  # Move the in-memory replay onto disk
+            settings = agent.settings
+            for name, value in (overrides or {}).items():
+                setattr(settings, name, value)
+            agent.apply_settings(settings)
+            self.agent = agent
+            self.generation = generation_number(latest_save) + 1
+            print(f"Resumed from {latest_save}")
+        else:
+            self.agent = Agent(settings)
+        self.settings = settings
+        if settings.replay_path:
+            self.agent.use_replay_storage(os.path.join(settings.replay_path, 'agent1'))
+        # Ape-X style exploration: each actor gets a fixed epsilon on a log scale
+        if num_actors > 1:
+            self.epsilons = [base_epsilon ** (1 + i / (num_actors - 1) * epsilon_alpha) for i in range(num_actors)]
+        else:
+            self.epsilons = [base_epsilon]
+
+    def run(self, max_steps=None, max_seconds=None):
+        ctx = mp.get_context("spawn")
+        num_params = sum(param.numel() for param in self.agent.policy_net.parameters())
+        weights = SharedWeights(ctx, num_params)
+        weights.publish(self.agent.policy_net)
+        rings = [TransitionRing(ctx, self.ring_capacity) for _ in range(self.num_actors)]
+        stop_event = ctx.Event()
+
+        actors = []
+        for actor_id in range(self.num_actors):
+            process = ctx.Process(
+                target=actor_loop,
+                args=(self.settings, rings[actor_id], weights, self.epsilons[actor_id],
+                      stop_event, self.weight_poll_interval, 1000 + actor_id),
+                daemon=True,
+            )
+            process.start()
+            actors.append(process)
+
+        env_steps = 0
+        learner_steps = 0
+        start_time = time.perf_counter()
+        last_autosave_time = start_time
+        memory = self.agent.memory
+        try:
+            while True:
+                if max_steps is not None and env_steps >= max_steps:
+                    break
+                now = time.perf_counter()
+                if max_seconds is not None and now - start_time >= max_seconds:
+                    break
+
+                for ring in rings:
+                    block = ring.drain()
+                    if block is None:
+                        continue
+                    memory.add_batch(
+                        memory.max_priority,
+                        block[:, :STATE_SIZE],
+                        block[:, STATE_SIZE],
+                        block[:, STATE_SIZE + 1],
+                        block[:, STATE_SIZE + 2:],
+                    )
+                    env_steps += len(block)
+
+                if len(memory) < self.agent.batch_size:
+                    time.sleep(0.001)
+                    continue
+
+                self.agent.learn()
+                learner_steps += 1
+                self.agent.steps += 1  # Counts learner updates, so a resumed run keeps its target sync phase
+                self.agent.sync_target_network(self.agent.steps)
+                if learner_steps % self.weight_sync_interval == 0:
+                    weights.publish(self.agent.policy_net)
+
+                if self.autosave_interval and now - last_autosave_time >= self.autosave_interval:
+                    self.autosave()
+                    last_autosave_time = now
+        except KeyboardInterrupt:
+            print("Interrupted")
+        finally:
+            stop_event.set()
+            for process in actors:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+
+        elapsed = time.perf_counter() - start_time
+        self.autosave()
+        self.report(env_steps, learner_steps, sum(ring.dropped.value for ring in rings), elapsed)
+        return env_steps, learner_steps, elapsed
+
+    def autosave(self):
+        filename = f'generation_{self.generation:04d}.json'
+        filepath = os.path.join(self.save_directory, filename)
+        # The learner's agent plays both sides, matching the actors' self-play. It never
+        # acts itself, so the saved copy gets epsilon_min instead of its initial epsilon
+        snapshot = GameInstance(self.agent, self.agent, self.settings).snapshot(self.include_replay, self.generation)
+        snapshot[1]['agent1']['epsilon'] = self.agent.epsilon_min  # The copied agent state, not the live agent
+        write_checkpoint(snapshot, filepath)
+        print(f"Saved {filepath}")
+        self.generation += 1
+
+    def report(self, env_steps, learner_steps, dropped, elapsed):
+        print(f"Actors: {self.num_actors}")
+        print(f"Transitions: {env_steps} ({dropped} dropped)")
+        print(f"Learner steps: {learner_steps}")
+        print(f"Elapsed: {elapsed:.2f}s")
+        if elapsed > 0:
+            print(f"Transitions/sec: {env_steps / elapsed:.1f}")
+            print(f"Learner steps/sec: {learner_steps / elapsed:.1f}")
@@ -0,0 +1,86 @@
+import numpy as np
+
+# Torch-free forward pass of the DQN MLP for acting. load_state_dict() and
+# load_network() snapshot the Linear layers into contiguous float32 matrices;
+# bind_network() instead views a CPU network's parameters in place. forward()
+# runs into buffers preallocated per batch size, so a batch-size-1 action costs
+# three small matmuls and no allocations. It also works as a greedy agent on its
+# own (get_action/get_actions), e.g. for evaluation without torch.
+class NumpyPolicy:
+    def __init__(self, state_dict=None):
+        self.layers = []  # (weight with shape (in, out), bias) per Linear layer
+        self.buffers = {}  # batch size -> (input buffer, one output buffer per layer)
+        self.activations = None  # Per-layer outputs of the last forward(), like DQN.activations
+        self.bound = False  # True while the matrices are views of a live network's parameters
+        if state_dict is not None:
+            self.load_state_dict(state_dict)
+
+    def load_state_dict(self, state_dict):
+        # Accepts a DQN state_dict of tensors or arrays; layers are taken in order
+        prefixes = [key[:-len('.weight')] for key in state_dict if key.endswith('.weight')]
+        layers = []
+        for prefix in prefixes:
+            weight = self.to_numpy(state_dict[prefix + '.weight'])
+            bias = self.to_numpy(state_dict[prefix + '.bias'])
+            layers.append((np.ascontiguousarray(weight.T, dtype=np.float32), np.array(bias, dtype=np.float32)))
+        self.set_layers(layers)
+        self.bound = False
+
+    def set_layers(self, layers):
+        if [weight.shape for weight, _ in layers] != [weight.shape for weight, _ in self.layers]:
+            self.buffers.clear()
+        self.layers = layers
+
+    def load_network(self, network):
+        # Refresh from a live DQN; copies into the existing matrices when the shapes match
+        linears = [module for module in network.modules() if hasattr(module, 'in_features')]
+        shapes = [(module.in_features, module.out_features) for module in linears]
+        if self.bound or shapes != [weight.shape for weight, _ in self.layers]:
+            self.load_state_dict(network.state_dict())
+            return
+        for module, (weight, bias) in zip(linears, self.layers):
+            np.copyto(weight, self.to_numpy(module.weight).T)
+            np.copyto(bias, self.to_numpy(module.bias))
+
+    def bind_network(self, network):
+        # Zero-copy view of a CPU network. Optimizer steps and load_state_dict update
+        # the parameters in place, so the view stays current without refreshing;
+        # only replacing the parameter tensors themselves requires binding again.
+        linears = [module for module in network.modules() if hasattr(module, 'in_features')]
+        self.set_layers([(module.weight.detach().numpy().T, module.bias.detach().numpy()) for module in linears])
+        self.bound = True
+
+    def to_numpy(self, value):
+        if hasattr(value, 'detach'):  # torch.Tensor, checked without importing torch
+            value = value.detach().cpu().numpy()
+        return np.asarray(value)
+
+    def get_buffers(self, batch_size):
+        buffers = self.buffers.get(batch_size)
+        if buffers is None:
+            input_buffer = np.empty((batch_size, self.layers[0][0].shape[0]), dtype=np.float32)
+            outputs = [np.empty((batch_size, weight.shape[1]), dtype=np.float32) for weight, _ in self.layers]
+            buffers = self.buffers[batch_size] = (input_buffer, outputs)
+        return buffers
+
+    def forward(self, states):
+        # states: a sequence of observations; returns Q-values of shape (batch, actions).
+        # The returned array and self.activations are reused by the next call.
+        input_buffer, outputs = self.get_buffers(len(states))
+        input_buffer[:] = states
+        x = input_buffer
+        last = len(self.layers) - 1
+        for i, ((weight, bias), out) in enumerate(zip(self.layers, outputs)):
+            np.matmul(x, weight, out=out)
+            out += bias
+            if i < last:
+                np.maximum(out, 0, out=out)  # ReLU
+            x = out
+        self.activations = outputs
+        return x
+
+    def get_action(self, state):
+        return int(self.forward((state,))[0].argmax())
+
+    def get_actions(self, states):
+        return self.forward(states).argmax(axis=1).tolist()
@@ -0,0 +1,29 @@
+import copy
+import warnings
+import numpy as np
+import torch
+import torch.nn as nn
+
+# int8 copies of a policy for acting. quantize_dynamic stores the Linear weights
+# as int8 and quantizes activations on the fly per batch. It pays off for wide
+# hidden layers; for small ones the per-call quantization overhead dominates.
+# game.evaluation.record_states provides reference observations for the check.
+
+def quantize_policy(network):
+    network = copy.deepcopy(network).cpu().eval()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # torch.ao.quantization deprecation notices
+        return torch.ao.quantization.quantize_dynamic(network, {nn.Linear}, dtype=torch.qint8)
+
+def check_quantized_policy(reference, quantized, states):
+    # Compares the greedy actions and Q-values of the int8 copy with the fp32 policy
+    with torch.no_grad():
+        state_tensor = torch.from_numpy(np.asarray(states, dtype=np.float32))
+        reference_q = reference(state_tensor)
+        quantized_q = quantized(state_tensor)
+    agreement = (reference_q.argmax(1) == quantized_q.argmax(1)).float().mean().item()
+    return {
+        'states': len(state_tensor),
+        'action_agreement': agreement,
+        'max_q_error': (reference_q - quantized_q).abs().max().item(),
+    }
@@ -1,6 +1,8 @@
 import random
 
 class RandomAgent:
+    agent_type = "random"
+
     def __init__(self, settings):
         self.settings = settings
         self.epsilon = 1.0
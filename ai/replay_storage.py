@@ -0,0 +1,79 @@
+import json
+import os
+import numpy as np
+
+STORAGE_VERSION = 1
+
+# Disk-backed transition arrays for PrioritizedReplayBuffer. Each field is a
+# .npy file opened with numpy.memmap, so capacity is bounded by disk rather
+# than RAM and the OS page cache keeps only the hot regions resident.
+# Priorities stay in the buffer's in-RAM segment trees; flush() writes them
+# next to the arrays together with size/position, and reopening the same
+# directory maps the files again without reading or deserializing them.
+#   path/states.npy, actions.npy, rewards.npy, next_states.npy   memmapped rows
+#   path/priorities.npy                                           alpha-scaled, per slot
+#   path/meta.json                                                written last by flush()
+class MemmapReplayStorage:
+    def __init__(self, path, capacity, state_size=8):
+        self.path = path
+        self.capacity = capacity
+        self.state_size = state_size
+        os.makedirs(path, exist_ok=True)
+
+        self.meta = self.read_meta()
+        if self.meta is not None and (self.meta['capacity'] != capacity or self.meta['state_size'] != state_size):
+            raise ValueError(f"Replay storage at {path} holds {self.meta['capacity']} x {self.meta['state_size']} transitions, "
+                             f"not {capacity} x {state_size}")
+
+        fields = {
+            'states': ((capacity, state_size), np.float32),
+            'actions': ((capacity,), np.int8),
+            'rewards': ((capacity,), np.float32),
+            'next_states': ((capacity, state_size), np.float32),
+        }
+        for name, (shape, dtype) in fields.items():
+            filename = os.path.join(path, name + '.npy')
+            if self.meta is not None and os.path.exists(filename):
+                array = np.load(filename, mmap_mode='r+')
+            else:
+                # Sparse on most filesystems: untouched pages take no disk or memory
+                array = np.lib.format.open_memmap(filename, mode='w+', dtype=dtype, shape=shape)
+            setattr(self, name, array)
+
+    def read_meta(self):
+        try:
+            with open(os.path.join(self.path, 'meta.json')) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        if meta.get('version') != STORAGE_VERSION:
+            raise ValueError(f"Unsupported replay storage version: {meta.get('version')}")
+        return meta
+
+    def load_priorities(self):
+        # Returns (priorities, size, position, max_priority) saved by the last flush, or None
+        if self.meta is None:
+            return None
+        priorities = np.load(os.path.join(self.path, 'priorities.npy'))
+        return priorities, self.meta['size'], self.meta['position'], self.meta['max_priority']
+
+    def flush(self, priorities, size, position, max_priority):
+        for array in (self.states, self.actions, self.rewards, self.next_states):
+            array.flush()
+        priorities_path = os.path.join(self.path, 'priorities.npy')
+        with open(priorities_path + '.tmp', 'wb') as f:
+            np.save(f, priorities)
+        os.replace(priorities_path + '.tmp', priorities_path)
+
+        self.meta = {
+            'version': STORAGE_VERSION,
+            'capacity': self.capacity,
+            'state_size': self.state_size,
+            'size': size,
+            'position': position,
+            'max_priority': max_priority,
+        }
+        meta_path = os.path.join(self.path, 'meta.json')
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(meta_path + '.tmp', meta_path)
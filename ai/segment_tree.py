@@ -0,0 +1,80 @@
+import operator
+import numpy as np
+
+# Array-backed binary segment trees used by PrioritizedReplayBuffer.
+# Leaves live in tree[capacity:2 * capacity] and every internal node holds the
+# reduction of its two children, so the root (tree[1]) is the reduction of all
+# leaves. Updates and prefix-sum searches take O(log n) and are vectorized over
+# whole batches of indices.
+class SegmentTree:
+    def __init__(self, capacity, operation, scalar_operation, neutral_element):
+        self.capacity = 1
+        while self.capacity < capacity:
+            self.capacity *= 2
+        self.operation = operation
+        self.scalar_operation = scalar_operation
+        self.neutral_element = neutral_element
+        self.tree = np.full(2 * self.capacity, neutral_element, dtype=np.float64)
+
+    def update(self, indices, values):
+        nodes = np.asarray(indices, dtype=np.int64) + self.capacity
+        if nodes.size == 1:
+            self._update_single(int(nodes.reshape(-1)[0]), float(np.reshape(values, -1)[0]))
+            return
+        self.tree[nodes] = values
+        # All leaves sit on the same level, so walk every touched path up in lockstep.
+        # Duplicate parents just recompute the same value, which is cheaper than deduplicating.
+        nodes = nodes // 2
+        while nodes[0] >= 1:
+            self.tree[nodes] = self.operation(self.tree[2 * nodes], self.tree[2 * nodes + 1])
+            nodes = nodes // 2
+
+    def build(self, values):
+        # Replaces every leaf at once (missing ones become neutral) and recomputes
+        # the internal nodes level by level, in O(n) rather than O(n log n)
+        self.tree[self.capacity:] = self.neutral_element
+        self.tree[self.capacity:self.capacity + len(values)] = values
+        level = self.capacity // 2
+        while level >= 1:
+            self.tree[level:2 * level] = self.operation(self.tree[2 * level:4 * level:2], self.tree[2 * level + 1:4 * level:2])
+            level //= 2
+
+    def _update_single(self, node, value):
+        tree = self.tree
+        tree[node] = value
+        node //= 2
+        while node >= 1:
+            tree[node] = self.scalar_operation(tree[2 * node], tree[2 * node + 1])
+            node //= 2
+
+    def __getitem__(self, indices):
+        return self.tree[np.asarray(indices, dtype=np.int64) + self.capacity]
+
+    def reduce(self):
+        return self.tree[1]
+
+class SumSegmentTree(SegmentTree):
+    def __init__(self, capacity):
+        super(SumSegmentTree, self).__init__(capacity, np.add, operator.add, 0.0)
+
+    def sum(self):
+        return self.reduce()
+
+    def find_prefixsum_idx(self, prefixsums):
+        # For each prefix sum, find the highest index i such that sum(leaves[:i]) <= prefixsum
+        prefixsums = np.array(prefixsums, dtype=np.float64)
+        nodes = np.ones(len(prefixsums), dtype=np.int64)
+        while nodes[0] < self.capacity:
+            left = 2 * nodes
+            left_values = self.tree[left]
+            go_right = left_values <= prefixsums
+            prefixsums -= left_values * go_right
+            nodes = left + go_right
+        return nodes - self.capacity
+
+class MinSegmentTree(SegmentTree):
+    def __init__(self, capacity):
+        super(MinSegmentTree, self).__init__(capacity, np.minimum, min, float("inf"))
+
+    def min(self):
+        return self.reduce()
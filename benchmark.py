@@ -0,0 +1,231 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # Draw benchmarks render to an offscreen surface
+
+import argparse
+import atexit
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import pygame
+import torch
+from game.game_instance import GameInstance
+from ai.agent import Agent, PrioritizedReplayBuffer
+from ai.random_agent import RandomAgent
+from ui.game_ui import GameUI
+from utils.settings import Settings
+
+# Each benchmark is a setup function returning (callable, iterations), optionally
+# followed by an untimed callable run before each timed call. The callable is
+# timed one call at a time and summarised as per-call microseconds.
+BENCHMARKS = {}
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+def seed_everything(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+def random_transition(rng):
+    return rng.random(8).astype(np.float32), int(rng.integers(3)), float(rng.standard_normal()), rng.random(8).astype(np.float32)
+
+@benchmark("game_update_random")
+def setup_game_update_random(settings, scale):
+    instance = GameInstance(RandomAgent(settings), RandomAgent(settings), settings)
+    return instance.update, 20000 * scale
+
+@benchmark("game_update_dqn")
+def setup_game_update_dqn(settings, scale):
+    instance = GameInstance(Agent(settings), Agent(settings), settings)
+    # Fill the replay buffers first so every update includes a learning step
+    for _ in range(instance.agent1.batch_size):
+        instance.update()
+    return instance.update, 500 * scale
+
+@benchmark("agent_get_action")
+def setup_agent_get_action(settings, scale):
+    agent = Agent(settings)
+    agent.epsilon = 0.0  # Always run the network
+    state = np.random.default_rng(0).random(8).tolist()
+    return lambda: agent.get_action(state), 5000 * scale
+
+@benchmark("agent_get_action_numpy")
+def setup_agent_get_action_numpy(settings, scale):
+    settings.inference_backend = "numpy"
+    return setup_agent_get_action(settings, scale)
+
+@benchmark("agent_update_filling")
+def setup_agent_update_filling(settings, scale):
+    agent = Agent(settings)
+    agent.batch_size = agent.memory.capacity + 1  # Keep the buffer below batch size so no learning happens
+    rng = np.random.default_rng(0)
+    transitions = [random_transition(rng) for _ in range(1000)]
+    cursor = iter(transitions * (10 * scale))
+    return lambda: agent.update(*next(cursor)), 5000 * scale
+
+@benchmark("agent_update_full")
+def setup_agent_update_full(settings, scale):
+    agent = Agent(settings)
+    fill_replay(agent.memory)  # Every timed update inserts into a full buffer and learns
+    rng = np.random.default_rng(0)
+    transitions = [random_transition(rng) for _ in range(1000)]
+    cursor = iter(transitions * scale)
+    return lambda: agent.update(*next(cursor)), 500 * scale
+
+def fill_replay(buffer):
+    rng = np.random.default_rng(0)
+    for start in range(0, buffer.capacity, 65536):
+        count = min(65536, buffer.capacity - start)
+        buffer.add_batch(
+            rng.random(count) + 0.1,
+            rng.random((count, 8), dtype=np.float32),
+            rng.integers(3, size=count),
+            rng.standard_normal(count).astype(np.float32),
+            rng.random((count, 8), dtype=np.float32),
+        )
+
+def setup_replay(capacity, operation, scale):
+    rng = np.random.default_rng(1)
+    buffer = PrioritizedReplayBuffer(capacity=capacity, alpha=0.6)
+    fill_replay(buffer)
+    if operation == "sample":
+        return lambda: buffer.sample(64, 0.4), 2000 * scale
+    indices = rng.integers(capacity, size=64)
+    priorities = rng.random(64) + 0.1
+    return lambda: buffer.update(indices, priorities), 2000 * scale
+
+for replay_capacity in (10000, 100000, 1000000):
+    for replay_operation in ("sample", "update"):
+        BENCHMARKS[f"replay_{replay_operation}_{replay_capacity}"] = (
+            lambda settings, scale, capacity=replay_capacity, operation=replay_operation: setup_replay(capacity, operation, scale))
+
+def setup_checkpoint(settings, operation, scale):
+    agent1, agent2 = Agent(settings), Agent(settings)
+    instance = GameInstance(agent1, agent2, settings)
+    fill_replay(agent1.memory)
+    fill_replay(agent2.memory)
+    directory = tempfile.mkdtemp(prefix="pong_benchmark_")
+    atexit.register(shutil.rmtree, directory, True)
+    filename = os.path.join(directory, "generation_0001.json")
+    instance.save(filename)
+    if operation == "save":
+        return lambda: instance.save(filename), 10 * scale
+    return lambda: GameInstance.load(filename), 10 * scale
+
+@benchmark("checkpoint_save")
+def setup_checkpoint_save(settings, scale):
+    return setup_checkpoint(settings, "save", scale)
+
+@benchmark("checkpoint_load")
+def setup_checkpoint_load(settings, scale):
+    return setup_checkpoint(settings, "load", scale)
+
+@benchmark("ui_draw")
+def setup_ui_draw(settings, scale):
+    pygame.init()
+    surface = pygame.Surface((1280, 720))
+    game_ui = GameUI(surface, pygame.font.Font(None, 22))
+    instance = GameInstance(RandomAgent(settings), RandomAgent(settings), settings)
+    # The game steps between draws so every frame is new, but only drawing is timed
+    return lambda: game_ui.draw(instance, False, False), 1000 * scale, instance.update
+
+def run_benchmark(name, seed, scale):
+    seed_everything(seed)
+    settings = Settings()
+    func, iterations, *prepare = BENCHMARKS[name](settings, scale)
+    prepare = prepare[0] if prepare else None
+    for _ in range(min(iterations // 10, 100)):  # Warm up caches and allocators
+        if prepare:
+            prepare()
+        func()
+    samples = []
+    for _ in range(iterations):
+        if prepare:
+            prepare()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    samples = np.array(samples) * 1e6
+    return {
+        "iterations": iterations,
+        "mean_us": float(samples.mean()),
+        "median_us": float(np.median(samples)),
+        "p90_us": float(np.percentile(samples, 90)),
+        "calls_per_sec": float(1e6 / samples.mean()),
+    }
+
+def compare(results, baseline, tolerance):
+    # A benchmark regresses when its median is more than `tolerance` slower than the baseline
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["median_us"] / baseline[name]["median_us"]
+        status = "REGRESSION" if ratio > 1 + tolerance else "ok"
+        print(f"{name:28s} {baseline[name]['median_us']:10.1f}us -> {result['median_us']:10.1f}us  x{ratio:5.2f}  {status}", file=sys.stderr)
+        if status != "ok":
+            regressions.append(name)
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Time the simulation and training hot paths")
+    parser.add_argument("--only", nargs="+", default=None, help="Benchmark names to run (default: all)")
+    parser.add_argument("--list", action="store_true", help="List benchmark names and exit")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for random, numpy and torch")
+    parser.add_argument("--scale", type=int, default=1, help="Multiply every benchmark's iteration count")
+    parser.add_argument("--threads", type=int, default=1, help="torch intra-op threads; pinned so results are comparable")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", default=None, help="Compare against a JSON file written by --output")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before --compare fails (0.2 = 20%%)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return
+    names = args.only or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        sys.exit(f"Unknown benchmark: {', '.join(unknown)}")
+    torch.set_num_threads(args.threads)
+
+    results = {}
+    for name in names:
+        results[name] = run_benchmark(name, args.seed, args.scale)
+        print(f"{name:28s} median {results[name]['median_us']:10.1f}us  ({results[name]['calls_per_sec']:.0f}/s)", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "torch": torch.__version__,
+            "numpy": np.__version__,
+            "seed": args.seed,
+            "scale": args.scale,
+            "threads": args.threads,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            sys.exit(f"{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import glob
+import json
+import os
+import queue
+import threading
+import numpy as np
+from ai.ai_factory import AIFactory
+from utils.settings import Settings
+
+CHECKPOINT_VERSION = 1
+
+# A checkpoint is a small JSON header (scores, generation, settings, agent
+# types) next to two sidecar files sharing its stem:
+#   generation_0001.json         header, written last so it marks a complete save
+#   generation_0001.pt           network and optimizer state_dicts (torch.save)
+#   generation_0001.replay.npz   replay buffers as raw NumPy arrays (optional)
+# Replay buffers backed by MemmapReplayStorage are not copied into the sidecar;
+# the writer flushes them to their own directory instead. That directory is
+# shared by every generation, so loading an older generation reattaches the
+# buffer as of the latest flush, not as it was when that generation was saved.
+
+def checkpoint_paths(filename):
+    stem = os.path.splitext(filename)[0]
+    return stem + '.json', stem + '.pt', stem + '.replay.npz'
+
+def find_latest_save(directory, include_legacy=False):
+    # The most recently written generation in directory; include_legacy also
+    # considers pickled saves from before the checkpoint format
+    saves = glob.glob(os.path.join(directory, 'generation_*.json'))
+    if include_legacy:
+        saves += glob.glob(os.path.join(directory, 'generation_*.pkl'))
+    if not saves:
+        return None
+    return max(saves, key=os.path.getctime)
+
+def generation_number(filename):
+    # generation_0007.json -> 7
+    return int(os.path.basename(filename).split('_')[1].split('.')[0])
+
+def snapshot_checkpoint(instance, include_replay=True, generation=None):
+    # Copies everything a checkpoint needs out of the live objects, so the
+    # (slow) writing can happen later on another thread while training goes on
+    shared_agent = instance.agent1 is instance.agent2
+    agents = [instance.agent1] if shared_agent else [instance.agent1, instance.agent2]
+
+    agent_types = []
+    weights = {}
+    replay = {}
+    storage_flushes = []
+    for i, agent in enumerate(agents, start=1):
+        agent_type = getattr(agent, 'agent_type', None)
+        if agent_type is None:
+            raise ValueError(f"Agent {i} ({agent.__class__.__name__}) cannot be checkpointed")
+        agent_types.append(agent_type)
+        if hasattr(agent, 'state_dict'):
+            weights[f'agent{i}'] = _copy_state(agent.state_dict())
+        if include_replay and getattr(agent.memory, 'storage', None) is not None:
+            # Disk-backed buffers persist themselves and are reopened from settings.replay_path.
+            # Only their priorities and counters are copied here; the writer does the flush
+            storage_flushes.append((agent.memory.storage, agent.memory.storage_state()))
+        elif include_replay and hasattr(agent.memory, 'state_dict'):
+            for key, value in agent.memory.state_dict().items():
+                replay[f'agent{i}_{key}'] = np.array(value)
+
+    header = {
+        'version': CHECKPOINT_VERSION,
+        'generation': generation,
+        'score1': instance.score1,
+        'score2': instance.score2,
+        'total_reward1': instance.total_reward1,
+        'total_reward2': instance.total_reward2,
+        'total_hits1': instance.total_hits1,
+        'total_hits2': instance.total_hits2,
+        'shared_agent': shared_agent,
+        'agent_types': agent_types,
+        'settings': instance.settings.to_dict(),
+    }
+    return header, weights, replay, storage_flushes
+
+def _copy_state(value):
+    if hasattr(value, 'detach'):  # torch.Tensor, checked without importing torch
+        return value.detach().to('cpu', copy=True)
+    if isinstance(value, dict):
+        return {key: _copy_state(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_copy_state(item) for item in value)
+    return value
+
+def write_checkpoint(snapshot, filename):
+    # Every file is written under a temporary name and renamed into place.
+    # The header goes last, so readers never see a half-written checkpoint.
+    header, weights, replay, storage_flushes = snapshot
+    header_path, weights_path, replay_path = checkpoint_paths(filename)
+    header = dict(header)
+
+    if weights:
+        import torch  # Imported lazily; policy-free sessions never need it
+        torch.save(weights, weights_path + '.tmp')
+        os.replace(weights_path + '.tmp', weights_path)
+    if replay:
+        with open(replay_path + '.tmp', 'wb') as f:
+            np.savez(f, **replay)
+        os.replace(replay_path + '.tmp', replay_path)
+    for storage, state in storage_flushes:
+        storage.flush(*state)
+
+    header['weights'] = os.path.basename(weights_path) if weights else None
+    header['replay'] = os.path.basename(replay_path) if replay else None
+    with open(header_path + '.tmp', 'w') as f:
+        json.dump(header, f, indent=2)
+    os.replace(header_path + '.tmp', header_path)
+
+def save_checkpoint(instance, filename, include_replay=True, generation=None):
+    write_checkpoint(snapshot_checkpoint(instance, include_replay, generation), filename)
+
+# Writes snapshots on a background thread. Finished saves and failures are
+# collected so the main loop can report them with poll().
+class BackgroundCheckpointWriter:
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, snapshot, filename):
+        self.jobs.put((snapshot, filename))
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                break
+            snapshot, filename = job
+            try:
+                write_checkpoint(snapshot, filename)
+                self.results.put((filename, None))
+            except Exception as e:
+                self.results.put((filename, e))
+            self.jobs.task_done()
+
+    def poll(self):
+        results = []
+        while True:
+            try:
+                results.append(self.results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def wait(self):
+        # Blocks until every save submitted so far is written; the writer stays usable
+        self.jobs.join()
+
+    def close(self):
+        # Waits for pending saves to finish
+        self.jobs.put(None)
+        self.thread.join()
+
+def report_saves(writer, report=print, short_names=False):
+    # Reports the saves a BackgroundCheckpointWriter finished since the last call
+    for filepath, error in writer.poll():
+        name = os.path.basename(filepath) if short_names else filepath
+        report(f"Saved {name}" if error is None else f"Save failed: {name} ({error})")
+
+def read_header(filename):
+    with open(checkpoint_paths(filename)[0]) as f:
+        header = json.load(f)
+    if header.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version: {header.get('version')}")
+    return header
+
+def load_policy_weights(filename, agent_index=1):
+    # Only the policy_net state_dict of one agent, for acting-only consumers that
+    # have no use for optimizers or replay. Returns (state_dict or None, header).
+    header = read_header(filename)
+    if header['shared_agent']:
+        agent_index = 1
+    if not header['weights']:
+        return None, header
+    import torch
+    weights = torch.load(os.path.join(os.path.dirname(filename), header['weights']), map_location='cpu')
+    agent_state = weights.get(f'agent{agent_index}')
+    if agent_state is None or 'policy_net' not in agent_state:
+        return None, header
+    return agent_state['policy_net'], header
+
+def load_agents(filename, include_replay=True, settings=None):
+    # Rebuild the agents stored in a checkpoint; returns (agent1, agent2, header)
+    header = read_header(filename)
+    directory = os.path.dirname(filename)
+    if settings is None:
+        settings = Settings.from_dict(header['settings'])
+
+    weights = {}
+    if header['weights']:
+        import torch
+        weights = torch.load(os.path.join(directory, header['weights']), map_location='cpu')
+    replay = None
+    if include_replay and header['replay']:
+        with np.load(os.path.join(directory, header['replay'])) as replay_file:
+            replay = dict(replay_file)
+
+    agents = []
+    for i, agent_type in enumerate(header['agent_types'], start=1):
+        agent = AIFactory.create_agent(agent_type, settings)
+        if f'agent{i}' in weights:
+            agent.load_state_dict(weights[f'agent{i}'])
+        if replay is not None and hasattr(agent.memory, 'load_state_dict'):
+            prefix = f'agent{i}_'
+            buffer_state = {key[len(prefix):]: value for key, value in replay.items() if key.startswith(prefix)}
+            if buffer_state:
+                agent.memory.load_state_dict(buffer_state)
+        agents.append(agent)
+
+    if header['shared_agent']:
+        agents.append(agents[0])
+    return agents[0], agents[1], header
+
+def migrate_legacy_agent(legacy, settings):
+    # Agents pickled before the checkpoint format unpickle as the current classes
+    # but with only their old attributes. Build a current agent of the same type
+    # and copy the networks, optimizer and list-of-tuples replay buffer into it.
+    agent = AIFactory.create_agent(legacy.agent_type, settings)
+    if not hasattr(agent, 'policy_net'):
+        return agent
+    agent.policy_net.load_state_dict(legacy.policy_net.state_dict())
+    agent.target_net.load_state_dict(legacy.target_net.state_dict())
+    agent.optimizer.load_state_dict(legacy.optimizer.state_dict())
+    for name in ('epsilon', 'beta', 'confidence', 'rebounds', 'last_reward'):
+        setattr(agent, name, getattr(legacy, name))
+    agent.performance_window.extend(legacy.performance_window)
+
+    legacy_memory = vars(legacy)['memory']  # Unpickled into __dict__, behind Agent's memory property
+    transitions = legacy_memory.buffer
+    if transitions:
+        memory = agent.memory
+        states, actions, rewards, next_states = zip(*transitions)
+        priorities = legacy_memory.priorities[:len(transitions)].astype(np.float64)
+        memory.load_state_dict({
+            'states': np.array(states, dtype=np.float32),
+            'actions': np.array(actions, dtype=np.int8),
+            'rewards': np.array(rewards, dtype=np.float32),
+            'next_states': np.array(next_states, dtype=np.float32),
+            'priorities': (priorities + memory.epsilon) ** memory.alpha,  # Stored scaled, as state_dict() does
+            'position': legacy_memory.position,
+            'max_priority': max(memory.max_priority, float(priorities.max())),
+        })
+    return agent
@@ -0,0 +1,168 @@
+import random
+import numpy as np
+from game.game_instance import GameInstance
+from ai.ai_factory import AIFactory
+
+# Greedy evaluation that skips the per-tick simulation. Between paddle contacts
+# the ball moves in a straight line with mirror reflections off the walls, so
+# its position after any number of ticks can be computed in closed form. The
+# evaluator only queries the agents every decision_interval ticks and jumps
+# straight to the next decision or paddle-plane crossing, whichever is first.
+class FastForwardEvaluator:
+    def __init__(self, agent1, agent2, settings, decision_interval=4, max_hits_per_rally=200, seed=None):
+        self.agent1 = agent1
+        self.agent2 = agent2
+        self.settings = settings
+        if decision_interval < 1:
+            raise ValueError(f"decision_interval must be at least 1, got {decision_interval}")  # The simulation would never advance
+        self.decision_interval = decision_interval
+        self.max_hits_per_rally = max_hits_per_rally  # Rallies longer than this count as draws
+        self.rng = random.Random(seed)
+
+        self.width = settings.width
+        self.height = settings.height
+        self.ball_size = settings.ball_size
+        self.paddle_width = settings.paddle_width
+        self.paddle_height = settings.paddle_height
+        self.paddle_speed = settings.paddle_speed
+        self.max_ball_y = self.height - self.ball_size
+        self.max_paddle_y = self.height - self.paddle_height
+
+        self.paddle1_x = int(self.width * 0.05)
+        self.paddle2_x = int(self.width * 0.95 - self.paddle_width)
+        # x positions of the ball's left edge at which it reaches each paddle's face
+        self.left_plane = self.paddle1_x + self.paddle_width
+        self.right_plane = self.paddle2_x - self.ball_size
+
+    def reset_ball(self):
+        self.ball_x = self.width // 2
+        self.ball_y = self.height // 2
+        self.ball_dx = self.rng.choice([-1, 1]) * self.settings.ball_speed
+        self.ball_dy = self.rng.uniform(-0.5, 0.5) * self.settings.ball_speed
+        self.missed = False  # Set once the ball has passed the paddle it was heading for
+        self.rally_hits = 0
+
+    def get_state(self, paddle_x, paddle_y, opponent_y):
+        # Same layout as GameInstance.get_state
+        return [
+            paddle_y / self.height,
+            opponent_y / self.height,
+            self.ball_x / self.width,
+            self.ball_y / self.height,
+            (self.ball_x - paddle_x) / self.width,
+            (self.ball_y - paddle_y) / self.height,
+            self.ball_dx / self.settings.ball_speed,
+            self.ball_dy / self.settings.ball_speed
+        ]
+
+    def select_actions(self):
+        state1 = self.get_state(self.paddle1_x, self.paddle1_y, self.paddle2_y)
+        state2 = self.get_state(self.paddle2_x, self.paddle2_y, self.paddle1_y)
+        if self.agent1 is self.agent2 and hasattr(self.agent1, "get_actions"):
+            return self.agent1.get_actions([state1, state2])
+        return self.agent1.get_action(state1), self.agent2.get_action(state2)
+
+    def time_to_next_event(self):
+        if self.ball_dx < 0:
+            target = 0 if self.missed else self.left_plane
+        else:
+            target = self.width if self.missed else self.right_plane
+        return max((target - self.ball_x) / self.ball_dx, 0.0)
+
+    def advance(self, ticks, action1, action2):
+        self.paddle1_y = self.move_paddle(self.paddle1_y, action1, ticks)
+        self.paddle2_y = self.move_paddle(self.paddle2_y, action2, ticks)
+        self.ball_x += self.ball_dx * ticks
+
+        # Unfold the wall reflections: the path is periodic with period 2 * max_ball_y,
+        # and the vertical direction is flipped while in the mirrored half
+        period = 2 * self.max_ball_y
+        unfolded = (self.ball_y + self.ball_dy * ticks) % period
+        if unfolded <= self.max_ball_y:
+            self.ball_y = unfolded
+        else:
+            self.ball_y = period - unfolded
+            self.ball_dy = -self.ball_dy
+
+    def move_paddle(self, paddle_y, action, ticks):
+        if action == 1:  # Move up
+            return max(0, paddle_y - self.paddle_speed * ticks)
+        elif action == 2:  # Move down
+            return min(self.max_paddle_y, paddle_y + self.paddle_speed * ticks)
+        return paddle_y
+
+    def resolve_event(self, results):
+        # Called with the ball exactly on a paddle plane or a goal line.
+        # Returns True when the rally is over.
+        if self.missed:
+            if self.ball_dx < 0:
+                results['score2'] += 1
+            else:
+                results['score1'] += 1
+            return True
+
+        if self.ball_dx < 0:
+            paddle_y = self.paddle1_y
+            side = 1
+        else:
+            paddle_y = self.paddle2_y
+            side = 2
+        if self.ball_y < paddle_y + self.paddle_height and self.ball_y + self.ball_size > paddle_y:
+            self.ball_dx *= -1.1  # Same speed-up as Ball.bounce
+            self.ball_dy = self.rng.uniform(-0.5, 0.5) * self.settings.ball_speed
+            results[f'hits{side}'] += 1
+            self.rally_hits += 1
+            if self.rally_hits >= self.max_hits_per_rally:
+                results['draws'] += 1
+                return True
+        else:
+            self.missed = True
+        return False
+
+    def run(self, rallies):
+        results = {'rallies': 0, 'score1': 0, 'score2': 0, 'draws': 0, 'hits1': 0, 'hits2': 0, 'ticks': 0.0, 'decisions': 0}
+        saved_epsilons = [getattr(agent, 'epsilon', None) for agent in (self.agent1, self.agent2)]
+        for agent in (self.agent1, self.agent2):
+            if hasattr(agent, 'epsilon'):
+                agent.epsilon = 0.0  # Greedy evaluation
+
+        self.paddle1_y = self.max_paddle_y // 2
+        self.paddle2_y = self.max_paddle_y // 2
+        try:
+            while results['rallies'] < rallies:
+                self.reset_ball()
+                rally_over = False
+                while not rally_over:
+                    action1, action2 = self.select_actions()
+                    results['decisions'] += 1
+                    remaining = self.decision_interval
+                    while remaining > 0 and not rally_over:
+                        event_ticks = self.time_to_next_event()
+                        ticks = min(remaining, event_ticks)
+                        self.advance(ticks, action1, action2)
+                        remaining -= ticks
+                        results['ticks'] += ticks
+                        if ticks == event_ticks:
+                            rally_over = self.resolve_event(results)
+                results['rallies'] += 1
+        finally:
+            for agent, epsilon in zip((self.agent1, self.agent2), saved_epsilons):
+                if epsilon is not None:
+                    agent.epsilon = epsilon
+        return results
+
+def record_states(settings, count=5000, seed=0):
+    # Observations from both paddles of a game between random agents, e.g. as the
+    # reference set for ai.quantization.check_quantized_policy
+    saved_random_state = random.getstate()  # RandomAgent draws from the global generator
+    random.seed(seed)
+    try:
+        instance = GameInstance(AIFactory.create_agent("random", settings), AIFactory.create_agent("random", settings), settings)
+        states = []
+        while len(states) < count:
+            states.append(instance.get_state(instance.paddle1, instance.paddle2))
+            states.append(instance.get_state(instance.paddle2, instance.paddle1))
+            instance.update()
+    finally:
+        random.setstate(saved_random_state)
+    return np.array(states[:count], dtype=np.float32)
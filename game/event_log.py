@@ -0,0 +1,64 @@
+import numpy as np
+
+AGENT1_HIT = 0
+AGENT2_HIT = 1
+AGENT1_SCORE = 2
+AGENT2_SCORE = 3
+AGENT1_REWARD = 4
+AGENT2_REWARD = 5
+
+EVENT_FORMATS = [
+    "Agent 1 hit the ball",
+    "Agent 2 hit the ball",
+    "Agent 1 scores!",
+    "Agent 2 scores!",
+    "Agent 1 reward: {value:.2f}",
+    "Agent 2 reward: {value:.2f}",
+]
+
+EVENT_DTYPE = np.dtype([('code', np.int8), ('step', np.int64), ('value', np.float32)])
+
+# Fixed-size ring of (code, step, value) records. Recording writes into
+# preallocated arrays, so the simulation never formats strings or grows a list;
+# text is only produced by format_since() for the few events the UI shows.
+class EventLog:
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.records = np.zeros(capacity, dtype=EVENT_DTYPE)
+        self.codes = self.records['code']
+        self.steps = self.records['step']
+        self.values = self.records['value']
+        self.counters = np.zeros(len(EVENT_FORMATS), dtype=np.int64)
+        self.count = 0  # Total events ever recorded; also the cursor for since()
+
+    def record(self, code, step, value=0.0):
+        index = self.count % self.capacity
+        self.codes[index] = code
+        self.steps[index] = step
+        self.values[index] = value
+        self.counters[code] += 1
+        self.count += 1
+
+    def since(self, cursor, limit=None):
+        # Records added after cursor, oldest first. Events that were already
+        # overwritten, or beyond the newest `limit`, are skipped.
+        start = max(cursor, self.count - self.capacity)
+        if limit is not None:
+            start = max(start, self.count - limit)
+        if start >= self.count:
+            return self.records[:0]
+        indices = np.arange(start, self.count) % self.capacity
+        return self.records[indices]
+
+    def format_since(self, cursor, limit=None):
+        return [self.format(record) for record in self.since(cursor, limit)]
+
+    def format(self, record):
+        return EVENT_FORMATS[record['code']].format(value=float(record['value']), step=int(record['step']))
+
+    def clear(self):
+        self.count = 0
+        self.counters[:] = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
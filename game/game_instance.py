@@ -1,13 +1,16 @@
 import pygame
 from game.paddle import Paddle
 from game.ball import Ball
-from ai.agent import Agent  # Add this import
+from game.event_log import EventLog, AGENT1_HIT, AGENT2_HIT, AGENT1_SCORE, AGENT2_SCORE, AGENT1_REWARD, AGENT2_REWARD
+from game.checkpoint import save_checkpoint, snapshot_checkpoint, load_agents, migrate_legacy_agent
+from utils.settings import Settings
+from utils.profiler import profiler
 import pickle
-import os
 import math
+import os
 
 class GameInstance:
-    def __init__(self, agent1, agent2, settings):
+    def __init__(self, agent1, agent2, settings, include_replay=True):
         self.agent1 = agent1
         self.agent2 = agent2
         self.settings = settings
@@ -16,7 +19,11 @@ class GameInstance:
         self.ball = Ball(settings)
         self.score1 = 0
         self.score2 = 0
-        self.events = []  # Store significant events for UI to display
+        self.events = EventLog()  # Significant events for the UI, stored as compact records
+        self.steps = 0  # Physics ticks
+        # Ticks each chosen action is repeated for (pickled legacy settings predate the option)
+        self.frame_skip = getattr(settings, 'frame_skip', 1)
+        self.recorder = None  # Optional TrajectoryRecorder that receives every transition
         self.last_hit = None  # Track which paddle last hit the ball
         self.total_reward1 = 0
         self.total_reward2 = 0
@@ -28,14 +35,71 @@ class GameInstance:
         self.last_distance2 = self._get_paddle_ball_distance(self.paddle2)
         self.total_hits1 = 0
         self.total_hits2 = 0
+        if include_replay:
+            self.attach_replay_storage()
+
+    def attach_replay_storage(self):
+        # Gives each learning agent its own memory-mapped replay directory
+        replay_path = getattr(self.settings, 'replay_path', None)
+        if not replay_path:
+            return
+        agents = [self.agent1] if self.agent1 is self.agent2 else [self.agent1, self.agent2]
+        for i, agent in enumerate(agents, start=1):
+            if hasattr(agent, "use_replay_storage"):
+                agent.use_replay_storage(os.path.join(replay_path, f'agent{i}'))
 
     def update(self):
+        # One agent decision. The chosen actions are held for frame_skip physics
+        # ticks and their rewards summed, so observation, inference and the replay
+        # insert happen once per decision rather than once per tick.
         state1 = self.get_state(self.paddle1, self.paddle2)
         state2 = self.get_state(self.paddle2, self.paddle1)
 
-        action1 = self.agent1.get_action(state1)
-        action2 = self.agent2.get_action(state2)
+        start = profiler.start()
+        action1, action2 = self._select_actions(state1, state2)
+        profiler.stop("sim.inference", start)
+
+        start = profiler.start()
+        reward1 = 0
+        reward2 = 0
+        point_scored = False
+        for _ in range(self.frame_skip):
+            tick_reward1, tick_reward2, point_scored = self._tick(action1, action2)
+            reward1 += tick_reward1
+            reward2 += tick_reward2
+            if point_scored:
+                break  # The next decision starts from the served ball
+
+        new_state1 = self.get_state(self.paddle1, self.paddle2)
+        new_state2 = self.get_state(self.paddle2, self.paddle1)
+        profiler.stop("sim.physics", start)
+
+        start = profiler.start()
+        self.agent1.update(state1, action1, reward1, new_state1)
+        self.agent2.update(state2, action2, reward2, new_state2)
+        profiler.stop("sim.agent_update", start)
+
+        if self.recorder is not None:
+            start = profiler.start()
+            self.recorder.record(1, state1, action1, reward1, new_state1, point_scored)
+            self.recorder.record(2, state2, action2, reward2, new_state2, point_scored)
+            profiler.stop("sim.record", start)
 
+        self.total_reward1 += reward1
+        self.total_reward2 += reward2
+
+        # Only add reward events if there's a significant change; they are stamped
+        # with the decision's last tick
+        if abs(reward1) >= 0.1:
+            self.events.record(AGENT1_REWARD, self.steps - 1, reward1)
+        if abs(reward2) >= 0.1:
+            self.events.record(AGENT2_REWARD, self.steps - 1, reward2)
+
+        # Update performance scores
+        self.update_performance_scores()
+
+    def _tick(self, action1, action2):
+        # Advances the physics by one tick; returns (reward1, reward2, point_scored)
         self.paddle1.move(action1)
         self.paddle2.move(action2)
         self.ball.move()
@@ -43,13 +107,14 @@ class GameInstance:
         reward1 = self._calculate_reward(self.paddle1, action1, 1)
         reward2 = self._calculate_reward(self.paddle2, action2, 2)
 
+        point_scored = False
         # Check for collisions and update rewards
         if self.paddle1.collides_with(self.ball):
             self.ball.bounce()
             reward1 += 1.0  # Increased reward for hitting the ball
             self.last_hit = self.paddle1
-            self.events.append("Agent 1 hit the ball")
-            if isinstance(self.agent1, Agent):
+            self.events.record(AGENT1_HIT, self.steps)
+            if hasattr(self.agent1, "add_rebound"):
                 self.agent1.add_rebound()
             self.ball_hits1 += 1
             self.total_hits1 += 1
@@ -57,8 +122,8 @@ class GameInstance:
             self.ball.bounce()
             reward2 += 1.0  # Increased reward for hitting the ball
             self.last_hit = self.paddle2
-            self.events.append("Agent 2 hit the ball")
-            if isinstance(self.agent2, Agent):
+            self.events.record(AGENT2_HIT, self.steps)
+            if hasattr(self.agent2, "add_rebound"):
                 self.agent2.add_rebound()
             self.ball_hits2 += 1
             self.total_hits2 += 1
@@ -68,39 +133,30 @@ class GameInstance:
                 self.score2 += 1
                 reward1 -= 2.0  # Increased penalty for losing a point
                 reward2 += 2.0  # Increased reward for scoring a point
-                self.events.append("Agent 2 scores!")
-                if isinstance(self.agent1, Agent):
+                self.events.record(AGENT2_SCORE, self.steps)
+                if hasattr(self.agent1, "reset_rebounds"):
                     self.agent1.reset_rebounds()
             else:
                 self.score1 += 1
                 reward1 += 2.0  # Increased reward for scoring a point
                 reward2 -= 2.0  # Increased penalty for losing a point
-                self.events.append("Agent 1 scores!")
-                if isinstance(self.agent2, Agent):
+                self.events.record(AGENT1_SCORE, self.steps)
+                if hasattr(self.agent2, "reset_rebounds"):
                     self.agent2.reset_rebounds()
             self.ball.reset()
+            point_scored = True
 
-        new_state1 = self.get_state(self.paddle1, self.paddle2)
-        new_state2 = self.get_state(self.paddle2, self.paddle1)
-
-        self.agent1.update(state1, action1, reward1, new_state1)
-        self.agent2.update(state2, action2, reward2, new_state2)
-
-        self.total_reward1 += reward1
-        self.total_reward2 += reward2
-
-        # Only add reward events if there's a significant change
-        if abs(reward1) >= 0.1:
-            self.events.append(f"Agent 1 reward: {reward1:.2f}")
-        if abs(reward2) >= 0.1:
-            self.events.append(f"Agent 2 reward: {reward2:.2f}")
-
-        # Update performance scores
-        self.update_performance_scores()
-
-        # Update last distances for the next iteration
+        # Update last distances for the next tick
         self.last_distance1 = self._get_paddle_ball_distance(self.paddle1)
         self.last_distance2 = self._get_paddle_ball_distance(self.paddle2)
+        self.steps += 1
+        return reward1, reward2, point_scored
+
+    def _select_actions(self, state1, state2):
+        # With a shared self-play policy both paddles are served by a single batched forward pass
+        if self.agent1 is self.agent2 and hasattr(self.agent1, "get_actions"):
+            return self.agent1.get_actions([state1, state2])
+        return self.agent1.get_action(state1), self.agent2.get_action(state2)
 
     def _calculate_reward(self, paddle, action, player_num):
         reward = 0
@@ -143,25 +199,40 @@ class GameInstance:
             self.ball.dy / self.settings.ball_speed
         ]
 
-    def save(self, filename):
-        save_data = {
-            'agent1': self.agent1,
-            'agent2': self.agent2,
-            'score1': self.score1,
-            'score2': self.score2,
-            'settings': self.settings,
-            'total_reward1': self.total_reward1,
-            'total_reward2': self.total_reward2
-        }
-        with open(filename, 'wb') as f:
-            pickle.dump(save_data, f)
+    def save(self, filename, include_replay=True, generation=None):
+        save_checkpoint(self, filename, include_replay, generation)
+
+    def snapshot(self, include_replay=True, generation=None):
+        # In-memory copy for BackgroundCheckpointWriter
+        return snapshot_checkpoint(self, include_replay, generation)
 
     @classmethod
-    def load(cls, filename):
+    def load(cls, filename, include_replay=True):
+        if filename.endswith('.pkl'):
+            return cls.load_legacy(filename)
+
+        agent1, agent2, header = load_agents(filename, include_replay)
+        instance = cls(agent1, agent2, agent1.settings, include_replay)
+        instance.score1 = header['score1']
+        instance.score2 = header['score2']
+        instance.total_reward1 = header['total_reward1']
+        instance.total_reward2 = header['total_reward2']
+        instance.total_hits1 = header['total_hits1']
+        instance.total_hits2 = header['total_hits2']
+        instance.update_performance_scores()
+        return instance
+
+    @classmethod
+    def load_legacy(cls, filename):
+        # Saves from before the checkpoint format pickled the whole agents; they are
+        # migrated to current agents, which then save in the checkpoint format
         with open(filename, 'rb') as f:
             save_data = pickle.load(f)
-        
-        instance = cls(save_data['agent1'], save_data['agent2'], save_data['settings'])
+
+        settings = Settings.from_dict(vars(save_data['settings']))
+        agent1 = migrate_legacy_agent(save_data['agent1'], settings)
+        agent2 = agent1 if save_data['agent2'] is save_data['agent1'] else migrate_legacy_agent(save_data['agent2'], settings)
+        instance = cls(agent1, agent2, settings)
         instance.score1 = save_data['score1']
         instance.score2 = save_data['score2']
         instance.total_reward1 = save_data.get('total_reward1', 0)
@@ -169,12 +240,12 @@ class GameInstance:
         return instance
 
     def get_learning_progress(self):
-        if isinstance(self.agent1, Agent):
+        if hasattr(self.agent1, "get_learning_progress"):
             progress1 = self.agent1.get_learning_progress()
         else:
             progress1 = 1.0  # Assume non-learning agents are always at 100%
 
-        if isinstance(self.agent2, Agent):
+        if hasattr(self.agent2, "get_learning_progress"):
             progress2 = self.agent2.get_learning_progress()
         else:
             progress2 = 1.0
@@ -182,8 +253,8 @@ class GameInstance:
         return (progress1 + progress2) / 2  # Average progress of both agents
 
     def get_confidence(self):
-        confidence1 = self.agent1.get_confidence() if isinstance(self.agent1, Agent) else 1.0
-        confidence2 = self.agent2.get_confidence() if isinstance(self.agent2, Agent) else 1.0
+        confidence1 = self.agent1.get_confidence() if hasattr(self.agent1, "get_confidence") else 1.0
+        confidence2 = self.agent2.get_confidence() if hasattr(self.agent2, "get_confidence") else 1.0
         return confidence1, confidence2
 
     def update_performance_scores(self):
@@ -0,0 +1,118 @@
+import glob
+import io
+import os
+import queue
+import threading
+import zipfile
+import numpy as np
+
+CHUNK_PATTERN = 'chunk_*.npz'
+
+# Streams every transition of a GameInstance to append-only, compressed chunk
+# files. Rows go into preallocated arrays; a full chunk is handed to a
+# background thread that compresses and writes it, so the simulation only ever
+# copies a few numbers per step. Each chunk holds chunk_size rows of
+#   states, actions, rewards, next_states, dones, paddles (1 = left, 2 = right)
+# where done marks the transition on which a point was scored.
+class TrajectoryRecorder:
+    def __init__(self, directory, chunk_size=65536, state_size=8, max_pending_chunks=8, compress_level=1):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.compress_level = compress_level
+        self.state_size = state_size
+        os.makedirs(directory, exist_ok=True)
+        existing = chunk_paths(directory)
+        # New chunks are numbered after whatever a previous run left behind
+        self.next_chunk = int(os.path.basename(existing[-1])[len('chunk_'):-len('.npz')]) + 1 if existing else 0
+        self.rows = 0
+        self.recorded = 0
+        self.allocate_chunk()
+
+        # Bounded so a stalled disk cannot grow memory without limit; the simulation
+        # only waits once max_pending_chunks full chunks are queued
+        self.jobs = queue.Queue(maxsize=max_pending_chunks)
+        self.errors = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def allocate_chunk(self):
+        self.states = np.empty((self.chunk_size, self.state_size), dtype=np.float32)
+        self.actions = np.empty(self.chunk_size, dtype=np.int8)
+        self.rewards = np.empty(self.chunk_size, dtype=np.float32)
+        self.next_states = np.empty((self.chunk_size, self.state_size), dtype=np.float32)
+        self.dones = np.empty(self.chunk_size, dtype=np.bool_)
+        self.paddles = np.empty(self.chunk_size, dtype=np.int8)
+
+    def record(self, paddle, state, action, reward, next_state, done):
+        row = self.rows
+        self.states[row] = state
+        self.actions[row] = action
+        self.rewards[row] = reward
+        self.next_states[row] = next_state
+        self.dones[row] = done
+        self.paddles[row] = paddle
+        self.rows += 1
+        self.recorded += 1
+        if self.rows == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        # Hands the rows recorded so far to the writer and starts a new chunk
+        if self.rows == 0:
+            return
+        chunk = {
+            'states': self.states[:self.rows],
+            'actions': self.actions[:self.rows],
+            'rewards': self.rewards[:self.rows],
+            'next_states': self.next_states[:self.rows],
+            'dones': self.dones[:self.rows],
+            'paddles': self.paddles[:self.rows],
+        }
+        filename = os.path.join(self.directory, f'chunk_{self.next_chunk:06d}.npz')
+        self.jobs.put((chunk, filename))
+        self.next_chunk += 1
+        self.rows = 0
+        self.allocate_chunk()  # The queued chunk keeps its arrays; never overwrite them
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            chunk, filename = job
+            try:
+                write_chunk(chunk, filename + '.tmp', self.compress_level)
+                os.replace(filename + '.tmp', filename)
+            except Exception as e:
+                self.errors.put((filename, e))
+
+    def poll_errors(self):
+        errors = []
+        while True:
+            try:
+                errors.append(self.errors.get_nowait())
+            except queue.Empty:
+                return errors
+
+    def close(self):
+        # Writes the partial chunk and waits for every pending write
+        self.flush()
+        self.jobs.put(None)
+        self.thread.join()
+
+def write_chunk(chunk, filename, compress_level=1):
+    # Same layout as numpy.savez_compressed, so np.load reads it. Each array is
+    # compressed in a single zlib call, which releases the GIL for its duration,
+    # and level 1 trades a little size for much less CPU.
+    with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED, compresslevel=compress_level) as archive:
+        for name, array in chunk.items():
+            buffer = io.BytesIO()
+            np.lib.format.write_array(buffer, array)
+            archive.writestr(name + '.npy', buffer.getvalue())
+
+def chunk_paths(directory):
+    return sorted(glob.glob(os.path.join(directory, CHUNK_PATTERN)))
+
+def load_chunk(filename):
+    with np.load(filename) as chunk:
+        return {key: chunk[key] for key in chunk.files}
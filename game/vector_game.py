@@ -0,0 +1,173 @@
+import numpy as np
+
+# Runs N independent games in lockstep. Physics, collisions and rewards follow
+# GameInstance, but every per-game value lives in a NumPy array so one step()
+# call advances all games at once.
+class VectorGameInstance:
+    def __init__(self, num_games, settings, seed=None):
+        self.num_games = num_games
+        self.settings = settings
+        self.rng = np.random.default_rng(seed)
+
+        self.width = settings.width
+        self.height = settings.height
+        self.paddle_width = settings.paddle_width
+        self.paddle_height = settings.paddle_height
+        self.paddle_speed = settings.paddle_speed
+        self.ball_size = settings.ball_size
+        self.ball_speed = settings.ball_speed
+
+        # Paddles never move horizontally, so their x positions are shared
+        self.paddle1_x = int(self.width * 0.05)
+        self.paddle2_x = int(self.width * 0.95 - self.paddle_width)
+
+        self.paddle1_y = np.zeros(num_games, dtype=np.float64)
+        self.paddle2_y = np.zeros(num_games, dtype=np.float64)
+        self.ball_x = np.zeros(num_games, dtype=np.float64)
+        self.ball_y = np.zeros(num_games, dtype=np.float64)
+        self.ball_dx = np.zeros(num_games, dtype=np.float64)
+        self.ball_dy = np.zeros(num_games, dtype=np.float64)
+        self.score1 = np.zeros(num_games, dtype=np.int64)
+        self.score2 = np.zeros(num_games, dtype=np.int64)
+        self.total_reward1 = np.zeros(num_games, dtype=np.float64)
+        self.total_reward2 = np.zeros(num_games, dtype=np.float64)
+        self.total_hits1 = np.zeros(num_games, dtype=np.int64)
+        self.total_hits2 = np.zeros(num_games, dtype=np.int64)
+        self.last_distance1 = np.zeros(num_games, dtype=np.float64)
+        self.last_distance2 = np.zeros(num_games, dtype=np.float64)
+
+        # Scratch buffers for the observations returned by get_states()
+        self._states1 = np.empty((num_games, 8), dtype=np.float32)
+        self._states2 = np.empty((num_games, 8), dtype=np.float32)
+
+        self.reset()
+
+    def reset(self):
+        self.paddle1_y[:] = (self.height - self.paddle_height) // 2
+        self.paddle2_y[:] = (self.height - self.paddle_height) // 2
+        self._reset_balls(np.ones(self.num_games, dtype=bool))
+        self.score1[:] = 0
+        self.score2[:] = 0
+        self.total_reward1[:] = 0
+        self.total_reward2[:] = 0
+        self.total_hits1[:] = 0
+        self.total_hits2[:] = 0
+        self.last_distance1[:] = self._get_paddle_ball_distance(self.paddle1_x, self.paddle1_y)
+        self.last_distance2[:] = self._get_paddle_ball_distance(self.paddle2_x, self.paddle2_y)
+        return self.get_states()
+
+    def _reset_balls(self, mask):
+        count = int(mask.sum())
+        if count == 0:
+            return
+        self.ball_x[mask] = self.width // 2
+        self.ball_y[mask] = self.height // 2
+        self.ball_dx[mask] = self.rng.choice([-1, 1], size=count) * self.ball_speed
+        self.ball_dy[mask] = self.rng.uniform(-0.5, 0.5, size=count) * self.ball_speed
+
+    def step(self, actions1, actions2):
+        # actions use the Paddle.move encoding (0: stay, 1: up, 2: down), one per game.
+        # Returns both sides' observations, the rewards and a mask of games where a point was scored.
+        actions1 = np.asarray(actions1)
+        actions2 = np.asarray(actions2)
+
+        self._move_paddle(self.paddle1_y, actions1)
+        self._move_paddle(self.paddle2_y, actions2)
+
+        # Ball movement with wall reflection
+        self.ball_x += self.ball_dx
+        self.ball_y += self.ball_dy
+        wall_hit = (self.ball_y <= 0) | (self.ball_y >= self.height - self.ball_size)
+        self.ball_dy[wall_hit] *= -1
+
+        reward1 = self._calculate_reward(self.paddle1_x, self.paddle1_y, actions1, self.last_distance1)
+        reward2 = self._calculate_reward(self.paddle2_x, self.paddle2_y, actions2, self.last_distance2)
+
+        # Collisions; paddle 1 takes precedence like in GameInstance.update
+        hit1 = self._collides(self.paddle1_x, self.paddle1_y)
+        hit2 = ~hit1 & self._collides(self.paddle2_x, self.paddle2_y)
+        bounced = hit1 | hit2
+        bounce_count = int(bounced.sum())
+        if bounce_count:
+            self.ball_dx[bounced] *= -1.1  # Increase speed slightly on bounce
+            self.ball_dy[bounced] = self.rng.uniform(-0.5, 0.5, size=bounce_count) * self.ball_speed
+        reward1 += hit1
+        reward2 += hit2
+        self.total_hits1 += hit1
+        self.total_hits2 += hit2
+
+        # Scoring
+        out = (self.ball_x < 0) | (self.ball_x > self.width)
+        left_side = self.ball_x < self.width / 2
+        point2 = out & left_side
+        point1 = out & ~left_side
+        self.score1 += point1
+        self.score2 += point2
+        reward1 += 2.0 * point1 - 2.0 * point2
+        reward2 += 2.0 * point2 - 2.0 * point1
+        self._reset_balls(out)
+
+        self.total_reward1 += reward1
+        self.total_reward2 += reward2
+
+        self.last_distance1[:] = self._get_paddle_ball_distance(self.paddle1_x, self.paddle1_y)
+        self.last_distance2[:] = self._get_paddle_ball_distance(self.paddle2_x, self.paddle2_y)
+
+        states1, states2 = self.get_states()
+        return states1, states2, reward1, reward2, out
+
+    def _move_paddle(self, paddle_y, actions):
+        paddle_y -= (actions == 1) * self.paddle_speed
+        paddle_y += (actions == 2) * self.paddle_speed
+        np.clip(paddle_y, 0, self.height - self.paddle_height, out=paddle_y)
+
+    def _collides(self, paddle_x, paddle_y):
+        # Same test as pygame.Rect.colliderect on the integer ball rect
+        ball_left = np.trunc(self.ball_x)
+        ball_top = np.trunc(self.ball_y)
+        return (
+            (ball_left < paddle_x + self.paddle_width) &
+            (paddle_x < ball_left + self.ball_size) &
+            (ball_top < paddle_y + self.paddle_height) &
+            (paddle_y < ball_top + self.ball_size)
+        )
+
+    def _calculate_reward(self, paddle_x, paddle_y, actions, last_distance):
+        paddle_center = paddle_y + self.paddle_height / 2
+
+        # Reward for moving towards the ball
+        current_distance = self._get_paddle_ball_distance(paddle_x, paddle_y)
+        reward = (last_distance - current_distance) * 0.1
+
+        # Penalty for unnecessary movement
+        reward -= 0.05 * ((actions != 0) & (np.abs(paddle_center - self.ball_y) < self.paddle_height / 4))
+
+        # Reward for staying in the middle when the ball is far
+        far = np.abs(self.ball_x - paddle_x) > self.width / 2
+        middle_reward = 1 - np.abs(paddle_center - self.height / 2) / (self.height / 2)
+        reward += np.where(far, middle_reward * 0.1, 0.0)
+
+        # Reward for keeping the paddle in play area
+        reward -= 0.1 * ((paddle_y < 0) | (paddle_y + self.paddle_height > self.height))
+
+        return reward
+
+    def _get_paddle_ball_distance(self, paddle_x, paddle_y):
+        return np.hypot(paddle_x - self.ball_x, paddle_y + self.paddle_height / 2 - self.ball_y)
+
+    def get_states(self):
+        # Same layout as GameInstance.get_state. The arrays are reused between calls,
+        # so copy them if they need to outlive the next step.
+        self._fill_state(self._states1, self.paddle1_x, self.paddle1_y, self.paddle2_y)
+        self._fill_state(self._states2, self.paddle2_x, self.paddle2_y, self.paddle1_y)
+        return self._states1, self._states2
+
+    def _fill_state(self, out, paddle_x, paddle_y, opponent_y):
+        out[:, 0] = paddle_y / self.height
+        out[:, 1] = opponent_y / self.height
+        out[:, 2] = self.ball_x / self.width
+        out[:, 3] = self.ball_y / self.height
+        out[:, 4] = (self.ball_x - paddle_x) / self.width  # Relative x position
+        out[:, 5] = (self.ball_y - paddle_y) / self.height  # Relative y position
+        out[:, 6] = self.ball_dx / self.ball_speed
+        out[:, 7] = self.ball_dy / self.ball_speed
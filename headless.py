@@ -0,0 +1,232 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # No display needed on training boxes
+
+import argparse
+import time
+from game.game_instance import GameInstance
+from game.checkpoint import BackgroundCheckpointWriter, find_latest_save, generation_number, report_saves
+from game.evaluation import FastForwardEvaluator, record_states
+from game.recorder import TrajectoryRecorder
+from ai.ai_factory import AIFactory
+from ai.numpy_policy import NumpyPolicy
+from utils.settings import Settings
+from utils.cli import positive_int
+from utils.profiler import profiler
+
+class HeadlessTrainer:
+    def __init__(self, agent1_type, agent2_type, settings, save_directory="saves", autosave_interval=300, resume=False, self_play=False, include_replay=True, record_directory=None, overrides=None):
+        self.settings = settings
+        self.save_directory = save_directory
+        self.autosave_interval = autosave_interval
+        self.include_replay = include_replay
+        self.generation = 1
+        os.makedirs(self.save_directory, exist_ok=True)
+        self.checkpoint_writer = BackgroundCheckpointWriter()
+
+        latest_save = find_latest_save(self.save_directory) if resume else None
+        if latest_save:
+            self.instance = GameInstance.load(latest_save)
+            if settings.replay_path and not self.instance.settings.replay_path:
+                # Move a resumed run's in-memory replay onto disk
+                self.instance.settings.replay_path = settings.replay_path
+                self.instance.attach_replay_storage()
+            self.apply_overrides(overrides or {})
+            self.generation = generation_number(latest_save) + 1
+            print(f"Resumed from {latest_save}")
+        else:
+            agent1 = AIFactory.create_agent(agent1_type, settings)
+            # Self-play shares one agent (and one network) between both paddles
+            agent2 = agent1 if self_play else AIFactory.create_agent(agent2_type, settings)
+            self.instance = GameInstance(agent1, agent2, settings)
+        if record_directory:
+            self.instance.recorder = TrajectoryRecorder(record_directory)
+
+    def apply_overrides(self, overrides):
+        # Settings passed explicitly on the command line win over the ones saved
+        # with the checkpoint; the loaded agents share the instance's settings
+        settings = self.instance.settings
+        for name, value in overrides.items():
+            setattr(settings, name, value)
+        self.instance.frame_skip = settings.frame_skip
+        for agent in (self.instance.agent1, self.instance.agent2):
+            if hasattr(agent, "apply_settings"):
+                agent.apply_settings(settings)
+
+    def run(self, max_steps=None, max_seconds=None):
+        steps = 0
+        start_time = time.perf_counter()
+        last_autosave_time = start_time
+        try:
+            while True:
+                if max_steps is not None and steps >= max_steps:
+                    break
+                now = time.perf_counter()
+                if max_seconds is not None and now - start_time >= max_seconds:
+                    break
+
+                self.instance.update()
+                steps += 1
+
+                if self.autosave_interval and now - last_autosave_time >= self.autosave_interval:
+                    self.autosave()
+                    last_autosave_time = now
+        except KeyboardInterrupt:
+            print("Interrupted")
+
+        elapsed = time.perf_counter() - start_time
+        self.autosave()
+        self.checkpoint_writer.close()
+        report_saves(self.checkpoint_writer)
+        if self.instance.recorder is not None:
+            self.instance.recorder.close()
+            self.report_recording()
+        self.report(steps, elapsed)
+        return steps, elapsed
+
+    def autosave(self):
+        filename = f'generation_{self.generation:04d}.json'
+        filepath = os.path.join(self.save_directory, filename)
+        start = profiler.start()
+        snapshot = self.instance.snapshot(self.include_replay, self.generation)
+        profiler.stop("autosave.snapshot", start)
+        self.checkpoint_writer.submit(snapshot, filepath)
+        self.generation += 1
+        report_saves(self.checkpoint_writer)
+
+    def report_recording(self):
+        recorder = self.instance.recorder
+        for filename, error in recorder.poll_errors():
+            print(f"Recording failed: {filename} ({error})")
+        print(f"Recorded {recorder.recorded} transitions to {recorder.directory}")
+
+    def report(self, steps, elapsed):
+        steps_per_second = steps / elapsed if elapsed > 0 else 0.0
+        print(f"Steps: {steps}")
+        print(f"Elapsed: {elapsed:.2f}s")
+        print(f"Steps/sec: {steps_per_second:.1f}")
+        if self.instance.frame_skip > 1:
+            print(f"Ticks/sec: {self.instance.steps / elapsed if elapsed > 0 else 0.0:.1f}")
+        print(f"Score: {self.instance.score1} - {self.instance.score2}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train Pong AI agents without a display")
+    parser.add_argument("--agent1", default="dqn", help="Agent type for the left paddle")
+    parser.add_argument("--agent2", default="dqn", help="Agent type for the right paddle")
+    parser.add_argument("--steps", type=int, default=None, help="Stop after this many simulation steps")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds of wall-clock time")
+    parser.add_argument("--autosave-interval", type=float, default=300, help="Seconds between autosaves (0 disables)")
+    parser.add_argument("--save-dir", default="saves", help="Directory for generation saves")
+    parser.add_argument("--self-play", action="store_true", help="Control both paddles with a single shared agent")
+    parser.add_argument("--no-replay", action="store_true", help="Write policy-only checkpoints without the replay buffer")
+    parser.add_argument("--resume", action="store_true", help="Continue from the latest save in --save-dir")
+    parser.add_argument("--width", type=int, default=800, help="Simulation width")
+    parser.add_argument("--height", type=int, default=600, help="Simulation height")
+    parser.add_argument("--hidden-size", type=int, default=64, help="Width of the DQN hidden layers")
+    parser.add_argument("--actors", type=int, default=0, help="Run this many actor processes feeding one learner (0 trains in-process)")
+    parser.add_argument("--evaluate", metavar="CHECKPOINT", default=None, help="Play greedy fast-forward rallies with a saved generation instead of training")
+    parser.add_argument("--rallies", type=int, default=1000, help="Rallies to play with --evaluate")
+    parser.add_argument("--decision-interval", type=positive_int, default=4, help="Ticks between agent decisions with --evaluate")
+    parser.add_argument("--profile", metavar="FILE", default=None, help="Time each simulation and training phase and write the breakdown to FILE")
+    parser.add_argument("--frame-skip", type=int, default=None, help="Physics ticks each action is repeated for")
+    parser.add_argument("--inference-backend", choices=["torch", "numpy", "int8"], default=None, help="Forward pass used for acting")
+    parser.add_argument("--replay-capacity", type=int, default=None, help="Replay buffer capacity per agent")
+    parser.add_argument("--replay-path", default=None, help="Keep replay buffers in memory-mapped files under this directory")
+    parser.add_argument("--record", metavar="DIR", default=None, help="Stream every transition to compressed chunk files in DIR")
+    parser.add_argument("--train-frequency", type=int, default=None, help="Env steps between learner updates")
+    parser.add_argument("--gradient-steps", type=int, default=None, help="Optimizer steps per learner update")
+    parser.add_argument("--target-update", choices=["hard", "soft"], default=None, help="Target network sync policy")
+    parser.add_argument("--target-update-interval", type=int, default=None, help="Env steps between hard target syncs")
+    parser.add_argument("--tau", type=float, default=None, help="Polyak factor for soft target updates")
+    args = parser.parse_args()
+    if args.steps is None and args.duration is None and args.evaluate is None:
+        parser.error("one of --steps or --duration is required")
+    if args.inference_backend == "int8" and args.actors == 0 and args.evaluate is None:
+        parser.error("--inference-backend int8 applies to --actors and --evaluate; the in-process learning agent acts in fp32")
+    if args.actors > 0:
+        # Actors always play self-play with copies of the learner's DQN
+        if args.agent1 != "dqn" or args.agent2 != "dqn":
+            parser.error("--actors trains a single dqn agent; --agent1/--agent2 must be dqn")
+        if args.record:
+            parser.error("--record is not supported with --actors")
+    return args
+
+def quantized_agents(agent1, agent2, settings):
+    # int8 acting copies of the policies, each checked against its fp32 original.
+    # Imported here so runs that never quantize do not load torch for it
+    from ai.actor_agent import ActorAgent
+    from ai.quantization import check_quantized_policy
+    settings = Settings.from_dict(settings.to_dict())
+    settings.inference_backend = "int8"
+    states = record_states(settings)
+    copies = {}
+    for agent in (agent1, agent2):
+        if id(agent) in copies or not hasattr(agent, "policy_net"):
+            continue
+        actor = ActorAgent(settings)
+        actor.load_state_dict(agent.policy_net.state_dict())
+        check = check_quantized_policy(agent.policy_net, actor.acting_net, states)
+        print(f"int8 check on {check['states']} states: {check['action_agreement']:.1%} same actions, max Q error {check['max_q_error']:.4f}")
+        copies[id(agent)] = actor
+    return copies.get(id(agent1), agent1), copies.get(id(agent2), agent2)
+
+def evaluate(checkpoint, rallies, decision_interval, inference_backend=None):
+    instance = GameInstance.load(checkpoint, include_replay=False)
+    agent1, agent2 = instance.agent1, instance.agent2
+    if inference_backend == "numpy":
+        # Play with greedy NumPy snapshots of the policies; a shared agent stays shared
+        agent1 = NumpyPolicy(agent1.policy_net.state_dict()) if hasattr(agent1, "policy_net") else agent1
+        if instance.agent2 is instance.agent1:
+            agent2 = agent1
+        elif hasattr(agent2, "policy_net"):
+            agent2 = NumpyPolicy(agent2.policy_net.state_dict())
+    elif inference_backend == "int8":
+        agent1, agent2 = quantized_agents(agent1, agent2, instance.settings)
+    evaluator = FastForwardEvaluator(agent1, agent2, instance.settings, decision_interval)
+    start_time = time.perf_counter()
+    results = evaluator.run(rallies)
+    elapsed = time.perf_counter() - start_time
+    print(f"Rallies: {results['rallies']} ({results['draws']} draws)")
+    print(f"Score: {results['score1']} - {results['score2']}")
+    print(f"Hits: {results['hits1']} - {results['hits2']}")
+    print(f"Simulated ticks: {results['ticks']:.0f} in {results['decisions']} decisions")
+    print(f"Elapsed: {elapsed:.2f}s")
+
+def main():
+    args = parse_args()
+    if args.evaluate is not None:
+        evaluate(args.evaluate, args.rallies, args.decision_interval, args.inference_backend)
+        return
+    settings = Settings(args.width, args.height)
+    settings.hidden_size = args.hidden_size
+    if args.replay_capacity is not None:
+        settings.replay_capacity = args.replay_capacity
+    if args.replay_path is not None:
+        settings.replay_path = args.replay_path
+    # Explicitly passed options that also apply to a resumed checkpoint
+    overrides = {
+        'inference_backend': args.inference_backend,
+        'frame_skip': args.frame_skip,
+        'train_frequency': args.train_frequency,
+        'gradient_steps': args.gradient_steps,
+        'target_update_mode': args.target_update,
+        'target_update_interval': args.target_update_interval,
+        'tau': args.tau,
+    }
+    overrides = {name: value for name, value in overrides.items() if value is not None}
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    if args.profile:
+        profiler.enable()
+    if args.actors > 0:
+        from ai.distributed import DistributedTrainer
+        trainer = DistributedTrainer(settings, args.actors, args.save_dir, args.autosave_interval, include_replay=not args.no_replay, resume=args.resume, overrides=overrides)
+    else:
+        trainer = HeadlessTrainer(args.agent1, args.agent2, settings, args.save_dir, args.autosave_interval, args.resume, args.self_play, not args.no_replay, args.record, overrides)
+    trainer.run(max_steps=args.steps, max_seconds=args.duration)
+    if args.profile:
+        print("\n".join(profiler.format_summary()))
+        profiler.export(args.profile)
+        print(f"Profile written to {args.profile}")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,12 @@
 import pygame
-import torch
 import os
-import shutil
 from game.game_instance import GameInstance
-from ai.agent import Agent
+from game.checkpoint import BackgroundCheckpointWriter, find_latest_save, generation_number, report_saves
 from ui.main_menu import MainMenu
 from ui.game_ui import GameUI
 from utils.settings import Settings
 from ai.ai_factory import AIFactory
+from utils.profiler import profiler
 import glob
 import time
 
@@ -23,15 +22,15 @@ class PongAISimulation:
         self.update_font()
         self.instances = []
         self.current_instance = None
-        self.settings = Settings(self.screen_width, self.screen_height)
+        self.settings = Settings()  # Simulation world size is independent of the window
         self.main_menu = MainMenu(self.screen, self.font)
         self.game_ui = GameUI(self.screen, self.font)
         self.paused = False
-        self.ai_types = ["dqn", "random"]
+        self.ai_types = list(AIFactory.registry)
         self.current_ai_type = 0
         self.training_mode = False
         self.training_speed = 5
-        self.accumulated_events = []
+        self.event_cursor = 0  # Position in the current instance's event log already shown
         self.event_update_interval = 60  # Update console every 60 frames (1 second at 60 FPS)
         self.frame_count = 0
         self.autosave_interval = 300  # Autosave every 5 minutes (300 seconds)
@@ -39,6 +38,7 @@ class PongAISimulation:
         self.generation = 1  # Add this line to keep track of the current generation
         self.save_directory = "saves"
         os.makedirs(self.save_directory, exist_ok=True)
+        self.checkpoint_writer = BackgroundCheckpointWriter()
 
     def update_font(self):
         self.font = pygame.font.Font(None, int(self.screen_height * 0.03))
@@ -46,7 +46,9 @@ class PongAISimulation:
     def run(self):
         running = True
         while running:
-            if self.current_instance:
+            frame_start = profiler.start()
+            drew_game = self.current_instance is not None
+            if drew_game:
                 self.run_game()
             else:
                 self.run_main_menu()
@@ -66,6 +68,8 @@ class PongAISimulation:
                     elif event.key == pygame.K_t:
                         self.training_mode = not self.training_mode
                         print(f"Training mode: {'ON' if self.training_mode else 'OFF'}")
+                    elif event.key == pygame.K_p:
+                        self.toggle_profiler()
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     if event.button == 1:  # Left mouse button
                         if self.current_instance:
@@ -80,18 +84,24 @@ class PongAISimulation:
                     self.screen_width, self.screen_height = event.size
                     self.screen = pygame.display.set_mode((self.screen_width, self.screen_height), pygame.RESIZABLE)
                     self.update_font()
-                    self.settings = Settings(self.screen_width, self.screen_height)
+                    # Only the UI depends on the window; the running simulation is untouched
+                    show_profiler = self.game_ui.show_profiler
                     self.game_ui = GameUI(self.screen, self.font)
+                    self.game_ui.show_profiler = show_profiler  # Keep the overlay across resizes
                     self.main_menu = MainMenu(self.screen, self.font)
-                    if self.current_instance:
-                        self.current_instance.settings = self.settings
-                        self.current_instance.paddle1.update_settings(self.settings)
-                        self.current_instance.paddle2.update_settings(self.settings)
-                        self.current_instance.ball.update_settings(self.settings)
 
-            pygame.display.flip()
+            report_saves(self.checkpoint_writer, self.game_ui.add_console_message, short_names=True)
+            start = profiler.start()
+            if drew_game:
+                # The game UI only pushes the regions that changed this frame
+                pygame.display.update(self.game_ui.dirty_rects)
+            else:
+                pygame.display.flip()
+            profiler.stop("frame.present", start)
+            profiler.stop("frame.total", frame_start)
             self.clock.tick(60 if not self.training_mode else 60 * self.training_speed)
 
+        self.checkpoint_writer.close()  # Let pending saves finish
         pygame.quit()
 
     def run_main_menu(self):
@@ -104,20 +114,20 @@ class PongAISimulation:
             self.settings = self.settings.show_settings_menu(self.screen, self.font)
 
     def run_game(self):
+        start = profiler.start()
         if not self.paused:
             for _ in range(self.training_speed if self.training_mode else 1):
                 self.current_instance.update()
-                self.accumulated_events.extend(self.current_instance.events)
-                self.current_instance.events.clear()  # Clear events after accumulating
+        profiler.stop("frame.simulate", start)
 
         self.frame_count += 1
 
-        # Process accumulated events every second
+        # Show the latest events every second; only the ones that fit in the console are formatted
         if self.frame_count >= self.event_update_interval:
-            if self.accumulated_events:
-                for event in self.accumulated_events:
-                    self.game_ui.add_console_message(event)
-                self.accumulated_events.clear()  # Clear accumulated events after processing
+            events = self.current_instance.events
+            for message in events.format_since(self.event_cursor, self.game_ui.console_output.maxlen):
+                self.game_ui.add_console_message(message)
+            self.event_cursor = events.count
 
             # Add total reward information
             self.game_ui.add_console_message(f"Total Agent 1 reward: {self.current_instance.total_reward1:.2f}")
@@ -128,10 +138,14 @@ class PongAISimulation:
         # Autosave
         current_time = time.time()
         if current_time - self.last_autosave_time >= self.autosave_interval:
+            start = profiler.start()
             self.autosave()
+            profiler.stop("frame.autosave", start)
             self.last_autosave_time = current_time
 
+        start = profiler.start()
         self.game_ui.draw(self.current_instance, self.paused, self.training_mode)
+        profiler.stop("frame.draw", start)
 
     def create_new_instance(self):
         # Delete all existing save files
@@ -140,41 +154,61 @@ class PongAISimulation:
         agent1 = AIFactory.create_agent(self.ai_types[self.current_ai_type], self.settings)
         agent2 = AIFactory.create_agent(self.ai_types[self.current_ai_type], self.settings)
         self.current_instance = GameInstance(agent1, agent2, self.settings)
+        self.game_ui.invalidate()
+        self.event_cursor = 0
         self.instances.append(self.current_instance)
         self.generation = 1  # Reset generation counter
         self.game_ui.add_console_message("New game created. All previous saves deleted.")
 
     def load_instance(self):
-        saves = glob.glob(os.path.join(self.save_directory, 'generation_*.pkl'))
-        if saves:
-            latest_save = max(saves, key=os.path.getctime)
+        # Legacy pickled saves are still loadable
+        latest_save = find_latest_save(self.save_directory, include_legacy=True)
+        if latest_save:
             self.current_instance = GameInstance.load(latest_save)
+            self.game_ui.invalidate()
+            self.event_cursor = 0
             self.instances.append(self.current_instance)
             self.game_ui.add_console_message(f"Loaded latest save: {os.path.basename(latest_save)}")
-            # Extract generation number from filename
-            self.generation = int(os.path.basename(latest_save).split('_')[1].split('.')[0]) + 1
+            self.generation = generation_number(latest_save) + 1
         else:
             self.game_ui.add_console_message("No saves found. Starting a new game.")
             self.create_new_instance()
 
+    def toggle_profiler(self):
+        if profiler.enabled:
+            # Turning the overlay off keeps the collected timings in a file
+            profiler.disable()
+            filepath = os.path.join(self.save_directory, f"profile_{time.strftime('%Y%m%d_%H%M%S')}.json")
+            profiler.export(filepath)
+            self.game_ui.add_console_message(f"Profile saved: {os.path.basename(filepath)}")
+        else:
+            profiler.reset()
+            profiler.enable()
+        self.game_ui.show_profiler = profiler.enabled
+        print(f"Profiler: {'ON' if profiler.enabled else 'OFF'}")
+
     def autosave(self):
         if self.current_instance:
-            filename = f'generation_{self.generation:04d}.pkl'
+            filename = f'generation_{self.generation:04d}.json'
             filepath = os.path.join(self.save_directory, filename)
-            self.current_instance.save(filepath)
-            self.game_ui.add_console_message(f"Game autosaved: {filename}")
+            # Only the snapshot happens on this thread; writing is done in the background
+            self.checkpoint_writer.submit(self.current_instance.snapshot(generation=self.generation), filepath)
+            self.game_ui.add_console_message(f"Autosaving: {filename}")
             self.generation += 1
 
     def save_game(self):
         if self.current_instance:
-            filename = f'generation_{self.generation:04d}.pkl'
+            filename = f'generation_{self.generation:04d}.json'
             filepath = os.path.join(self.save_directory, filename)
-            self.current_instance.save(filepath)
-            self.game_ui.add_console_message(f"Game manually saved: {filename}")
+            self.checkpoint_writer.submit(self.current_instance.snapshot(generation=self.generation), filepath)
+            self.game_ui.add_console_message(f"Saving game: {filename}")
             self.generation += 1
 
     def delete_all_saves(self):
-        for file in glob.glob(os.path.join(self.save_directory, 'generation_*.pkl')):
+        # A queued or in-flight save would otherwise reappear after the delete
+        self.checkpoint_writer.wait()
+        report_saves(self.checkpoint_writer, self.game_ui.add_console_message, short_names=True)
+        for file in glob.glob(os.path.join(self.save_directory, 'generation_*')):
             os.remove(file)
         self.game_ui.add_console_message("All save files deleted.")
 
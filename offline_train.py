@@ -0,0 +1,232 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import queue
+import threading
+import time
+import numpy as np
+import torch
+from ai.agent import Agent
+from game.checkpoint import BackgroundCheckpointWriter, find_latest_save, generation_number, load_agents, read_header, report_saves
+from game.game_instance import GameInstance
+from game.recorder import chunk_paths, load_chunk
+from utils.settings import Settings
+
+# Trains a DQN from chunks written by TrajectoryRecorder (headless.py --record)
+# without running the simulation. Chunks are streamed through a generator
+# pipeline: a loader thread decompresses them ahead of time, a bounded shuffle
+# buffer decorrelates consecutive transitions, and large batches go through
+# Agent.train_on_batch, the same update step online learning uses.
+
+def iter_chunks(directories, epochs, paddles, rng):
+    # Every chunk in the directories, in a new random order each epoch
+    paths = [path for directory in directories for path in chunk_paths(directory)]
+    if not paths:
+        raise ValueError(f"No chunk files in {', '.join(directories)}")
+    for _ in range(epochs):
+        for index in rng.permutation(len(paths)):
+            chunk = load_chunk(paths[index])
+            keep = np.isin(chunk['paddles'], paddles)
+            yield {key: value[keep] for key, value in chunk.items()}
+
+def prefetch(iterator, depth=4):
+    # Runs the iterator on a background thread, keeping up to depth items ready
+    items = queue.Queue(maxsize=depth)
+    done = object()
+
+    def produce():
+        try:
+            for item in iterator:
+                items.put(item)
+        except BaseException as error:
+            items.put(error)  # Re-raised by the consumer, so a failed load stops training
+        else:
+            items.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = items.get()
+        if item is done:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+def shuffled_batches(chunks, buffer_size, batch_size, rng):
+    # Bounded shuffle buffer: rows are collected until buffer_size are held, then
+    # each batch is drawn uniformly from the buffer and its slots are refilled by
+    # the next incoming rows. Whatever is left at the end is drained in random order.
+    fields = None
+    size = 0
+    for chunk in chunks:
+        if fields is None:
+            fields = {key: np.empty((buffer_size,) + value.shape[1:], dtype=value.dtype) for key, value in chunk.items()}
+        offset = 0
+        count = len(chunk['actions'])
+        while offset < count:
+            take = min(count - offset, buffer_size - size)
+            for key, value in chunk.items():
+                fields[key][size:size + take] = value[offset:offset + take]
+            size += take
+            offset += take
+            while size == buffer_size:
+                # Move a random batch to the tail of the buffer, hand it out and free it
+                picks = rng.choice(size, batch_size, replace=False)
+                tail = np.arange(size - batch_size, size)
+                batch = {key: value[picks] for key, value in fields.items()}
+                moved = np.setdiff1d(tail, picks, assume_unique=True)
+                holes = np.setdiff1d(picks, tail, assume_unique=True)
+                for value in fields.values():
+                    value[holes] = value[moved]
+                size -= batch_size
+                yield batch
+    if fields is not None and size:
+        order = rng.permutation(size)
+        for start in range(0, size - batch_size + 1, batch_size):
+            picks = order[start:start + batch_size]
+            yield {key: value[picks] for key, value in fields.items()}
+
+class OfflineTrainer:
+    def __init__(self, settings, agent, save_directory="saves", checkpoint_interval=1000, generation=1):
+        self.settings = settings
+        self.agent = agent
+        self.save_directory = save_directory
+        self.checkpoint_interval = checkpoint_interval  # Gradient steps between checkpoints
+        self.generation = generation
+        os.makedirs(self.save_directory, exist_ok=True)
+        self.checkpoint_writer = BackgroundCheckpointWriter()
+
+    def train_step(self, batch):
+        agent = self.agent
+        device = agent.device
+        states = torch.from_numpy(batch['states']).to(device)
+        actions = torch.from_numpy(batch['actions']).long().to(device)
+        rewards = torch.from_numpy(batch['rewards']).to(device)
+        next_states = torch.from_numpy(batch['next_states']).to(device)
+        weights = torch.ones(len(states), device=device)  # Uniform replay, so no importance sampling
+
+        loss, _ = agent.train_on_batch(states, actions, rewards, next_states, weights)
+        agent.steps += 1  # Counts gradient steps here, which also drive hard target syncs
+        agent.sync_target_network(agent.steps)
+        return loss.item()
+
+    def run(self, batches, max_steps=None):
+        steps = 0
+        transitions = 0
+        running_loss = 0.0
+        start_time = time.perf_counter()
+        try:
+            for batch in batches:
+                running_loss += self.train_step(batch)
+                steps += 1
+                transitions += len(batch['actions'])
+                if steps % self.checkpoint_interval == 0:
+                    elapsed = time.perf_counter() - start_time
+                    print(f"Step {steps}: loss {running_loss / self.checkpoint_interval:.4f}, {transitions / elapsed:.0f} transitions/sec")
+                    running_loss = 0.0
+                    self.save()
+                if max_steps is not None and steps >= max_steps:
+                    break
+        except KeyboardInterrupt:
+            print("Interrupted")
+        except Exception:
+            # Let the checkpoints already submitted finish, but save nothing new
+            self.checkpoint_writer.close()
+            report_saves(self.checkpoint_writer)
+            raise
+
+        elapsed = time.perf_counter() - start_time
+        if steps % self.checkpoint_interval:
+            self.save()  # Only when there are steps since the last checkpoint
+        self.checkpoint_writer.close()
+        report_saves(self.checkpoint_writer)
+        print(f"Gradient steps: {steps}")
+        print(f"Transitions: {transitions}")
+        print(f"Elapsed: {elapsed:.2f}s")
+        print(f"Transitions/sec: {transitions / elapsed if elapsed > 0 else 0.0:.1f}")
+        return steps, elapsed
+
+    def save(self):
+        # Saved as a self-play instance so GameInstance.load() picks it up. The policy
+        # was never used to explore, so the saved copy acts greedily.
+        instance = GameInstance(self.agent, self.agent, self.settings, include_replay=False)
+        snapshot = instance.snapshot(include_replay=False, generation=self.generation)
+        snapshot[1]['agent1']['epsilon'] = self.agent.epsilon_min  # The copied agent state, not the live agent
+        filepath = os.path.join(self.save_directory, f'generation_{self.generation:04d}.json')
+        self.checkpoint_writer.submit(snapshot, filepath)
+        self.generation += 1
+        report_saves(self.checkpoint_writer)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train a DQN from recorded transition chunks")
+    parser.add_argument("data", nargs="+", help="Directories of chunk files written by headless.py --record")
+    parser.add_argument("--epochs", type=int, default=1, help="Passes over the data")
+    parser.add_argument("--max-steps", type=int, default=None, help="Stop after this many gradient steps")
+    parser.add_argument("--batch-size", type=int, default=1024, help="Transitions per gradient step")
+    parser.add_argument("--shuffle-buffer", type=int, default=262144, help="Transitions held in the shuffle buffer")
+    parser.add_argument("--learning-rate", type=float, default=None, help="Override the Adam learning rate")
+    parser.add_argument("--paddle", choices=["left", "right", "both"], default="both", help="Whose transitions to learn from")
+    parser.add_argument("--threads", type=int, default=os.cpu_count(), help="torch intra-op threads")
+    parser.add_argument("--save-dir", default="saves", help="Directory for checkpoints")
+    parser.add_argument("--checkpoint-interval", type=int, default=1000, help="Gradient steps between checkpoints")
+    parser.add_argument("--resume", action="store_true", help="Continue from the latest save in --save-dir")
+    parser.add_argument("--init", metavar="CHECKPOINT", default=None, help="Start from agent 1 of a checkpoint instead of a fresh network")
+    parser.add_argument("--hidden-size", type=int, default=64, help="Width of the DQN hidden layers for a fresh network")
+    parser.add_argument("--target-update", choices=["hard", "soft"], default=None, help="Target network update mode")
+    parser.add_argument("--target-update-interval", type=int, default=None, help="Gradient steps between hard target updates")
+    parser.add_argument("--tau", type=float, default=None, help="Polyak factor for soft target updates")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for shuffling and initialization")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.shuffle_buffer < args.batch_size:
+        raise SystemExit("--shuffle-buffer must hold at least one batch")
+    torch.set_num_threads(args.threads)
+    torch.manual_seed(args.seed)
+    # Separate streams for the loader thread and the shuffle buffer, so the draws
+    # do not depend on how the two threads interleave
+    chunk_rng, batch_rng = np.random.default_rng(args.seed).spawn(2)
+
+    generation = 1
+    start_from = args.init
+    latest_save = find_latest_save(args.save_dir) if args.resume else None
+    if latest_save:
+        start_from = latest_save
+        generation = generation_number(latest_save) + 1
+    if start_from:
+        header = read_header(start_from)
+        if header['agent_types'][0] != Agent.agent_type:
+            raise SystemExit(f"Cannot train a {header['agent_types'][0]} agent from {start_from}")
+        settings = Settings.from_dict(header['settings'])
+    else:
+        settings = Settings()
+        settings.hidden_size = args.hidden_size
+
+    # Offline training never replays, so the agent's replay buffer is never built
+    # and no replay storage is attached. The saved settings keep the replay options,
+    # so an online run resumed from these checkpoints gets its usual buffer.
+    if start_from:
+        agent, _, _ = load_agents(start_from, include_replay=False, settings=settings)
+        print(f"Starting from {start_from}")
+    else:
+        agent = Agent(settings)
+    if args.target_update is not None:
+        agent.target_update_mode = settings.target_update_mode = args.target_update
+    if args.target_update_interval is not None:
+        agent.target_update_interval = settings.target_update_interval = args.target_update_interval
+    if args.tau is not None:
+        agent.tau = settings.tau = args.tau
+    if args.learning_rate is not None:
+        for group in agent.optimizer.param_groups:
+            group['lr'] = args.learning_rate
+
+    paddles = {"left": [1], "right": [2], "both": [1, 2]}[args.paddle]
+    chunks = prefetch(iter_chunks(args.data, args.epochs, paddles, chunk_rng))
+    batches = shuffled_batches(chunks, args.shuffle_buffer, args.batch_size, batch_rng)
+    trainer = OfflineTrainer(settings, agent, args.save_dir, args.checkpoint_interval, generation)
+    trainer.run(batches, args.max_steps)
+
+if __name__ == "__main__":
+    main()
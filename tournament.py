@@ -0,0 +1,188 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import glob
+import json
+import time
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from ai.actor_agent import ActorAgent
+from game.checkpoint import load_policy_weights
+from game.evaluation import FastForwardEvaluator
+from utils.settings import Settings
+from utils.cli import positive_int
+
+# Round-robin of greedy fast-forward matches between saved generations. The
+# parent flattens every policy into one shared float32 array; workers read
+# the parameters for the two sides of a match straight out of it, so memory
+# stays flat however many generations are ranked.
+
+worker_state = {}
+
+def init_worker(shared_params, entries, game_settings, decision_interval, max_hits_per_rally, inference_backend):
+    torch.set_num_threads(1)  # Parallelism comes from the pool
+    worker_state['params'] = np.frombuffer(shared_params, dtype=np.float32)
+    worker_state['entries'] = entries
+    worker_state['game_settings'] = Settings.from_dict(game_settings)
+    worker_state['decision_interval'] = decision_interval
+    worker_state['max_hits_per_rally'] = max_hits_per_rally
+    worker_state['inference_backend'] = inference_backend
+
+def build_policy(index):
+    entry = worker_state['entries'][index]
+    settings = Settings.from_dict(entry['settings'])
+    settings.inference_backend = worker_state['inference_backend']
+    agent = ActorAgent(settings, epsilon=0.0)
+    vector = worker_state['params'][entry['offset']:entry['offset'] + entry['size']]
+    # The network's parameters become views of the shared array rather than copies.
+    # Acting never writes to them, so every worker reads the one shared set of weights
+    agent.load_parameter_vector(torch.from_numpy(vector))
+    return agent
+
+def play_match(task):
+    # Both policies play half of the rallies on each side
+    i, j, rallies, seed = task
+    agent_i, agent_j = build_policy(i), build_policy(j)
+    settings = worker_state['game_settings']
+    decision_interval = worker_state['decision_interval']
+    max_hits_per_rally = worker_state['max_hits_per_rally']
+
+    left = FastForwardEvaluator(agent_i, agent_j, settings, decision_interval, max_hits_per_rally, seed).run(rallies // 2)
+    right = FastForwardEvaluator(agent_j, agent_i, settings, decision_interval, max_hits_per_rally, seed + 1).run(rallies - rallies // 2)
+    wins_i = left['score1'] + right['score2']
+    wins_j = left['score2'] + right['score1']
+    draws = left['draws'] + right['draws']
+    return i, j, wins_i, wins_j, draws
+
+def fit_elo(num_players, matches, iterations=500, learning_rate=32.0):
+    # Batch Elo: ratings are adjusted together until every player's expected score
+    # over all of its matches matches its actual score, so the order in which
+    # matches finished does not matter. Draws count as half a win.
+    ratings = np.zeros(num_players)
+    games = np.zeros(num_players)
+    actual = np.zeros(num_players)
+    pairs = []
+    for i, j, wins_i, wins_j, draws in matches:
+        played = wins_i + wins_j + draws
+        if played == 0:
+            continue
+        pairs.append((i, j, played))
+        games[i] += played
+        games[j] += played
+        actual[i] += wins_i + 0.5 * draws
+        actual[j] += wins_j + 0.5 * draws
+    if not pairs:
+        return ratings + 1500
+    first, second, played = (np.array(column) for column in zip(*pairs))
+
+    for _ in range(iterations):
+        expected_first = 1 / (1 + 10 ** ((ratings[second] - ratings[first]) / 400))
+        expected = np.zeros(num_players)
+        np.add.at(expected, first, played * expected_first)
+        np.add.at(expected, second, played * (1 - expected_first))
+        ratings += learning_rate * (actual - expected) / np.maximum(games, 1)
+        ratings -= ratings.mean()
+    return ratings + 1500
+
+def load_entries(checkpoints, agent_index):
+    entries = []
+    vectors = []
+    offset = 0
+    for checkpoint in checkpoints:
+        policy_state, header = load_policy_weights(checkpoint, agent_index)
+        if policy_state is None:
+            print(f"Skipping {checkpoint}: no policy weights")
+            continue
+        vector = torch.cat([tensor.reshape(-1).float() for tensor in policy_state.values()]).numpy()
+        settings = Settings.from_dict(header['settings']).to_dict()
+        entries.append({'checkpoint': checkpoint, 'generation': header.get('generation'), 'settings': settings, 'offset': offset, 'size': len(vector)})
+        vectors.append(vector)
+        offset += len(vector)
+    return entries, vectors
+
+def run_tournament(checkpoints, rallies, workers, decision_interval=4, max_hits_per_rally=200, agent_index=1, seed=0, inference_backend="numpy"):
+    entries, vectors = load_entries(checkpoints, agent_index)
+    if len(entries) < 2:
+        raise ValueError("A tournament needs at least two checkpoints with policy weights")
+
+    ctx = mp.get_context("spawn")
+    shared_params = ctx.RawArray('f', sum(len(vector) for vector in vectors))
+    np.frombuffer(shared_params, dtype=np.float32)[:] = np.concatenate(vectors)
+    del vectors
+
+    # Matches are played in the first checkpoint's world; policies only need their own hidden size
+    game_settings = entries[0]['settings']
+    tasks = [(i, j, rallies, seed + 2 * k) for k, (i, j) in
+             enumerate((i, j) for i in range(len(entries)) for j in range(i + 1, len(entries)))]
+
+    matches = []
+    start_time = time.perf_counter()
+    with ctx.Pool(workers, initializer=init_worker,
+                  initargs=(shared_params, entries, game_settings, decision_interval, max_hits_per_rally, inference_backend)) as pool:
+        for result in pool.imap_unordered(play_match, tasks, chunksize=max(1, len(tasks) // (workers * 8))):
+            matches.append(result)
+            print(f"\rMatches: {len(matches)}/{len(tasks)}", end="", flush=True)
+    print(f"\nPlayed {len(tasks)} matches in {time.perf_counter() - start_time:.1f}s")
+
+    ratings = fit_elo(len(entries), matches)
+    table = []
+    for index, entry in enumerate(entries):
+        wins = losses = draws = 0
+        for i, j, wins_i, wins_j, match_draws in matches:
+            if index == i:
+                wins, losses = wins + wins_i, losses + wins_j
+            elif index == j:
+                wins, losses = wins + wins_j, losses + wins_i
+            else:
+                continue
+            draws += match_draws
+        played = wins + losses + draws
+        table.append({
+            'checkpoint': entry['checkpoint'],
+            'generation': entry['generation'],
+            'elo': float(ratings[index]),
+            'wins': wins,
+            'losses': losses,
+            'draws': draws,
+            'win_rate': (wins + 0.5 * draws) / played if played else 0.0,
+        })
+    table.sort(key=lambda row: row['elo'], reverse=True)
+    return table, matches
+
+def print_table(table):
+    print(f"{'Rank':>4}  {'Elo':>7}  {'Win rate':>8}  {'W':>6} {'L':>6} {'D':>6}  Checkpoint")
+    for rank, row in enumerate(table, start=1):
+        print(f"{rank:>4}  {row['elo']:7.1f}  {row['win_rate']:8.1%}  {row['wins']:>6} {row['losses']:>6} {row['draws']:>6}  {row['checkpoint']}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rank saved generations with a round-robin of greedy matches")
+    parser.add_argument("checkpoints", nargs="*", help="Checkpoint headers to rank (default: every generation in --save-dir)")
+    parser.add_argument("--save-dir", default="saves", help="Directory searched when no checkpoints are given")
+    parser.add_argument("--rallies", type=int, default=100, help="Rallies per match, split evenly between sides")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--decision-interval", type=positive_int, default=4, help="Ticks between agent decisions")
+    parser.add_argument("--max-hits", type=int, default=200, help="Rally length at which a rally counts as a draw")
+    parser.add_argument("--agent", type=int, choices=[1, 2], default=1, help="Which agent of each checkpoint to rank")
+    parser.add_argument("--inference-backend", choices=["torch", "numpy", "int8"], default="numpy", help="Forward pass used by the match workers")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed for the matches")
+    parser.add_argument("--output", default=None, help="Write the table and match results as JSON")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    checkpoints = args.checkpoints or sorted(glob.glob(os.path.join(args.save_dir, 'generation_*.json')))
+    table, matches = run_tournament(checkpoints, args.rallies, args.workers, args.decision_interval, args.max_hits, args.agent, args.seed, args.inference_backend)
+    print_table(table)
+    print(f"Best: {table[0]['checkpoint']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'best': table[0]['checkpoint'],
+                'table': table,
+                'matches': [dict(zip(('player1', 'player2', 'wins1', 'wins2', 'draws'), match)) for match in matches],
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
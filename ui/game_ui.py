@@ -1,6 +1,7 @@
 import pygame
 from ui.network_visualizer import NetworkVisualizer
-from ai.agent import Agent
+from ui.text_cache import TextCache
+from utils.profiler import profiler
 from collections import deque
 
 class GameUI:
@@ -8,12 +9,25 @@ class GameUI:
         self.screen = screen
         self.font = font
         self.network_visualizer = NetworkVisualizer(screen, font)
+        self.text_cache = TextCache(font)
         self.show_network_agent1 = False
         self.show_network_agent2 = False
         self.update_layout()
         self.console_output = deque(maxlen=20)  # Store last 20 console messages
         self.button_height = int(self.screen.get_height() * 0.05)
         self.button_spacing = int(self.screen.get_height() * 0.02)
+        # Backgrounds, titles and buttons are composited from a cached layer that is
+        # rebuilt only when the window size or a toggle changes
+        self.static_layer = None
+        self.static_layer_key = None
+        # Screen regions changed by the last draw(), for pygame.display.update()
+        self.dirty_rects = []
+        self.tracked_regions = {}
+        # Frame-time breakdown drawn over the game area; re-rendered every few frames
+        self.show_profiler = False
+        self.profiler_surface = None
+        self.profiler_refresh_interval = 30
+        self.profiler_frames = 0
 
     def update_layout(self):
         self.left_sidebar_width = int(self.screen.get_width() * 0.2)
@@ -23,11 +37,19 @@ class GameUI:
 
     def draw(self, game_instance, paused, training_mode):
         self.update_layout()
-        self.screen.fill((0, 0, 0))
-
-        # Draw game area
+        self.dirty_rects = []
         game_area = pygame.Rect(self.left_sidebar_width, 0, self.game_area_width, self.game_area_height)
-        pygame.draw.rect(self.screen, (50, 50, 50), game_area)
+
+        static_layer_key = (self.screen.get_size(), self.show_network_agent1, self.show_network_agent2)
+        if static_layer_key != self.static_layer_key:
+            self.build_static_layer()
+            self.static_layer_key = static_layer_key
+            self.dirty_rects.append(self.screen.get_rect())
+            self.tracked_regions.clear()
+        self.screen.blit(self.static_layer, (0, 0))
+
+        # Everything inside the game area changes every frame
+        self.dirty_rects.append(game_area)
 
         # Calculate scale factors
         scale_x = self.game_area_width / game_instance.settings.width
@@ -59,8 +81,8 @@ class GameUI:
         pygame.draw.rect(self.screen, (255, 255, 255), ball_rect)
 
         # Draw scores
-        score1_text = self.font.render(str(game_instance.score1), True, (255, 255, 255))
-        score2_text = self.font.render(str(game_instance.score2), True, (255, 255, 255))
+        score1_text = self.text_cache.render(str(game_instance.score1), (255, 255, 255))
+        score2_text = self.text_cache.render(str(game_instance.score2), (255, 255, 255))
         self.screen.blit(score1_text, (int(self.screen.get_width() * 0.4), int(self.screen.get_height() * 0.05)))
         self.screen.blit(score2_text, (int(self.screen.get_width() * 0.6), int(self.screen.get_height() * 0.05)))
 
@@ -72,54 +94,116 @@ class GameUI:
 
         # Draw pause indicator
         if paused:
-            pause_text = self.font.render("PAUSED", True, (255, 0, 0))
+            pause_text = self.text_cache.render("PAUSED", (255, 0, 0))
             pause_rect = pause_text.get_rect(center=(self.screen.get_width() // 2, self.screen.get_height() // 2))
             self.screen.blit(pause_text, pause_rect)
 
         # Draw training mode indicator
         if training_mode:
-            training_text = self.font.render("TRAINING MODE", True, (0, 255, 0))
+            training_text = self.text_cache.render("TRAINING MODE", (0, 255, 0))
             training_rect = training_text.get_rect(center=(self.screen.get_width() // 2, int(self.screen.get_height() * 0.05)))
             self.screen.blit(training_text, training_rect)
 
         # Draw neural network visualizations
-        if self.show_network_agent1 and isinstance(game_instance.agent1, Agent):
+        start = profiler.start()
+        if self.show_network_agent1 and hasattr(game_instance.agent1, "policy_net"):
             state1 = game_instance.get_state(game_instance.paddle1, game_instance.paddle2)
             activations1 = game_instance.agent1.get_network_activations(state1)
             self.network_visualizer.draw_network(game_instance.agent1.policy_net, activations1, game_area)
 
-        if self.show_network_agent2 and isinstance(game_instance.agent2, Agent):
+        if self.show_network_agent2 and hasattr(game_instance.agent2, "policy_net"):
             state2 = game_instance.get_state(game_instance.paddle2, game_instance.paddle1)
-            activations2 = game_instance.agent2.get_network_activations(state2)
+            # A shared self-play agent keeps the right paddle's activations in the second row
+            row2 = 1 if game_instance.agent2 is game_instance.agent1 else 0
+            activations2 = game_instance.agent2.get_network_activations(state2, row2)
             self.network_visualizer.draw_network(game_instance.agent2.policy_net, activations2, game_area)
+        profiler.stop("draw.network", start)
 
         # Draw confidence meters
         confidence1, confidence2 = game_instance.get_confidence()
         self.draw_confidence_meter(confidence1, "Agent 1", int(self.screen.get_width() * 0.25), int(self.screen.get_height() * 0.95))
         self.draw_confidence_meter(confidence2, "Agent 2", int(self.screen.get_width() * 0.55), int(self.screen.get_height() * 0.95))
 
+        # Draw performance bar
+        self.draw_performance_bar(game_instance)
+
+        if self.show_profiler:
+            self.draw_profiler_overlay(game_area)
+
+    def build_static_layer(self):
+        self.static_layer = pygame.Surface(self.screen.get_size())
+        self.static_layer.fill((0, 0, 0))
+        layer = self.static_layer
+
+        # Game area background
+        pygame.draw.rect(layer, (50, 50, 50), (self.left_sidebar_width, 0, self.game_area_width, self.game_area_height))
+
+        # Sidebar backgrounds and titles
+        pygame.draw.rect(layer, (30, 30, 30), (0, 0, self.left_sidebar_width, self.screen.get_height()))
+        pygame.draw.rect(layer, (30, 30, 30), (self.screen.get_width() - self.right_sidebar_width, 0, self.right_sidebar_width, self.screen.get_height()))
+        layer.blit(self.text_cache.render("Agent 1", (255, 255, 255)), (int(self.screen.get_width() * 0.01), int(self.screen.get_height() * 0.05)))
+        layer.blit(self.text_cache.render("Agent 2", (255, 255, 255)), (int(self.screen.get_width() * 0.01), int(self.screen.get_height() * 0.5)))
+        layer.blit(self.text_cache.render("Console Output", (255, 255, 255)), (self.screen.get_width() - self.right_sidebar_width + 10, 10))
+
         # Calculate button positions
         button_y = int(self.screen.get_height() * 0.7)
         
         # Draw neural network toggle buttons
-        self.draw_toggle_button("Show Agent 1 Network", self.show_network_agent1, int(self.screen.get_width() * 0.01), button_y)
+        self.draw_toggle_button("Show Agent 1 Network", self.show_network_agent1, int(self.screen.get_width() * 0.01), button_y, layer)
         button_y += self.button_height + self.button_spacing
-        self.draw_toggle_button("Show Agent 2 Network", self.show_network_agent2, int(self.screen.get_width() * 0.01), button_y)
+        self.draw_toggle_button("Show Agent 2 Network", self.show_network_agent2, int(self.screen.get_width() * 0.01), button_y, layer)
         button_y += self.button_height + self.button_spacing
 
         # Draw save game button
-        self.draw_button("Save Game", int(self.screen.get_width() * 0.01), button_y)
+        self.draw_button("Save Game", int(self.screen.get_width() * 0.01), button_y, layer)
         button_y += self.button_height + self.button_spacing
 
         # Draw main menu button
-        self.draw_button("Main Menu", int(self.screen.get_width() * 0.01), button_y)
-
-        # Draw performance bar
-        self.draw_performance_bar(game_instance)
+        self.draw_button("Main Menu", int(self.screen.get_width() * 0.01), button_y, layer)
+
+    def draw_profiler_overlay(self, game_area):
+        if self.profiler_surface is None or self.profiler_frames >= self.profiler_refresh_interval:
+            self.profiler_surface = self.build_profiler_surface(game_area.width - 20)
+            self.profiler_frames = 0
+        self.profiler_frames += 1
+        self.screen.blit(self.profiler_surface, (game_area.x + 10, int(self.screen.get_height() * 0.1)))
+
+    def build_profiler_surface(self, width):
+        summary = profiler.summary()
+        line_height = self.font.get_linesize()
+        surface = pygame.Surface((width, line_height * (len(summary) + 1) + 10), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 180))
+        columns = [5, int(width * 0.35), int(width * 0.5)]
+        bar_x = int(width * 0.65)
+        for text, x in zip(("Phase", "mean ms", "p95 ms"), columns):
+            surface.blit(self.text_cache.render(text, (255, 255, 0)), (x, 5))
+
+        # Bars are scaled to the slowest phase so the breakdown reads at a glance
+        longest = max((stats['mean_ms'] for stats in summary.values()), default=0) or 1
+        for i, (phase, stats) in enumerate(summary.items()):
+            y = 5 + (i + 1) * line_height
+            for text, x in zip((phase, f"{stats['mean_ms']:.2f}", f"{stats['p95_ms']:.2f}"), columns):
+                surface.blit(self.text_cache.render(text, (220, 220, 220)), (x, y))
+            bar_width = int((width - bar_x - 5) * stats['mean_ms'] / longest)
+            pygame.draw.rect(surface, (0, 200, 255), (bar_x, y + 2, bar_width, line_height - 4))
+        return surface
+
+    def invalidate(self):
+        # Forces the next draw() to rebuild the static layer and update the whole screen
+        self.static_layer_key = None
+
+    def blit_tracked(self, key, surface, position, value):
+        # Blits a dynamic element outside the game area and marks its region dirty
+        # only when its value or position changed since the last frame
+        rect = self.screen.blit(surface, position)
+        previous = self.tracked_regions.get(key)
+        if previous is None or previous[1] != value or previous[0] != rect:
+            self.dirty_rects.append(rect)
+            if previous is not None:
+                self.dirty_rects.append(previous[0])
+            self.tracked_regions[key] = (rect, value)
 
     def draw_left_sidebar(self, game_instance):
-        pygame.draw.rect(self.screen, (30, 30, 30), (0, 0, self.left_sidebar_width, self.screen.get_height()))
-        
         # Agent 1 data
         self.draw_agent_data(game_instance.agent1, "Agent 1", int(self.screen.get_width() * 0.01), int(self.screen.get_height() * 0.05))
         
@@ -127,41 +211,36 @@ class GameUI:
         self.draw_agent_data(game_instance.agent2, "Agent 2", int(self.screen.get_width() * 0.01), int(self.screen.get_height() * 0.5))
 
     def draw_right_sidebar(self):
-        pygame.draw.rect(self.screen, (30, 30, 30), (self.screen.get_width() - self.right_sidebar_width, 0, self.right_sidebar_width, self.screen.get_height()))
-        
-        title = self.font.render("Console Output", True, (255, 255, 255))
-        self.screen.blit(title, (self.screen.get_width() - self.right_sidebar_width + 10, 10))
-
         for i, message in enumerate(self.console_output):
-            text_surface = self.font.render(message, True, (200, 200, 200))
-            self.screen.blit(text_surface, (self.screen.get_width() - self.right_sidebar_width + 10, 50 + i * int(self.screen.get_height() * 0.03)))
+            text_surface = self.text_cache.render(message, (200, 200, 200))
+            position = (self.screen.get_width() - self.right_sidebar_width + 10, 50 + i * int(self.screen.get_height() * 0.03))
+            self.blit_tracked(("console", i), text_surface, position, message)
 
     def add_console_message(self, message):
         self.console_output.append(message)
 
     def draw_agent_data(self, agent, name, x, y):
-        title = self.font.render(name, True, (255, 255, 255))
-        self.screen.blit(title, (x, y))
-        
         data = [
             f"Type: {agent.__class__.__name__}",
             f"Epsilon: {agent.epsilon:.2f}",
-            f"Memory: {len(agent.memory) if hasattr(agent.memory, '__len__') else 'N/A'}",
+            f"Memory: {len(agent.memory) if hasattr(getattr(agent, 'memory', None), '__len__') else 'N/A'}",
             f"Last Reward: {agent.last_reward if hasattr(agent, 'last_reward') else 'N/A'}"
         ]
 
         for i, text in enumerate(data):
-            text_surface = self.font.render(text, True, (200, 200, 200))
-            self.screen.blit(text_surface, (x, y + int(self.screen.get_height() * 0.05) + i * int(self.screen.get_height() * 0.04)))
+            text_surface = self.text_cache.render(text, (200, 200, 200))
+            position = (x, y + int(self.screen.get_height() * 0.05) + i * int(self.screen.get_height() * 0.04))
+            self.blit_tracked((name, i), text_surface, position, text)
 
-    def draw_toggle_button(self, text, is_on, x, y):
+    def draw_toggle_button(self, text, is_on, x, y, surface=None):
+        surface = surface or self.screen
         button_width = self.left_sidebar_width - int(self.screen.get_width() * 0.02)
         button_rect = pygame.Rect(x, y, button_width, self.button_height)
         color = (0, 255, 0) if is_on else (255, 0, 0)
-        pygame.draw.rect(self.screen, color, button_rect)
-        text_surface = self.font.render(text, True, (0, 0, 0))
+        pygame.draw.rect(surface, color, button_rect)
+        text_surface = self.text_cache.render(text, (0, 0, 0))
         text_rect = text_surface.get_rect(center=button_rect.center)
-        self.screen.blit(text_surface, text_rect)
+        surface.blit(text_surface, text_rect)
 
     def toggle_network_view(self, mouse_pos):
         if self.check_button_click(mouse_pos, "Show Agent 1 Network"):
@@ -186,7 +265,7 @@ class GameUI:
         pygame.draw.rect(self.screen, (0, 255, 0), (bar_x, bar_y, progress_width, bar_height))
 
         # Draw text
-        text = self.font.render(f"Learning Progress: {progress:.0%}", True, (255, 255, 255))
+        text = self.text_cache.render(f"Learning Progress: {progress:.0%}", (255, 255, 255))
         text_rect = text.get_rect(center=(bar_x + bar_width // 2, bar_y - bar_height))
         self.screen.blit(text, text_rect)
 
@@ -202,17 +281,18 @@ class GameUI:
         pygame.draw.rect(self.screen, (0, 255, 0), (x, y, confidence_width, bar_height))
 
         # Draw text
-        text = self.font.render(f"{agent_name} Confidence: {confidence:.2f}", True, (255, 255, 255))
+        text = self.text_cache.render(f"{agent_name} Confidence: {confidence:.2f}", (255, 255, 255))
         text_rect = text.get_rect(center=(x + bar_width // 2, y - bar_height))
         self.screen.blit(text, text_rect)
 
-    def draw_button(self, text, x, y):
+    def draw_button(self, text, x, y, surface=None):
+        surface = surface or self.screen
         button_width = self.left_sidebar_width - int(self.screen.get_width() * 0.02)
         button_rect = pygame.Rect(x, y, button_width, self.button_height)
-        pygame.draw.rect(self.screen, (100, 100, 100), button_rect)
-        text_surface = self.font.render(text, True, (255, 255, 255))
+        pygame.draw.rect(surface, (100, 100, 100), button_rect)
+        text_surface = self.text_cache.render(text, (255, 255, 255))
         text_rect = text_surface.get_rect(center=button_rect.center)
-        self.screen.blit(text_surface, text_rect)
+        surface.blit(text_surface, text_rect)
 
     def check_button_click(self, mouse_pos, button_name):
         button_width = self.left_sidebar_width - int(self.screen.get_width() * 0.02)
@@ -258,15 +338,17 @@ class GameUI:
         # Draw dividing line
         pygame.draw.line(self.screen, (255, 255, 255), (bar_x + bar_width // 2, bar_y), (bar_x + bar_width // 2, bar_y + bar_height), 2)
 
-        # Draw labels
-        font = pygame.font.Font(None, int(bar_height * 0.8))
-        agent1_text = font.render(f"Agent 1: {game_instance.score1} ({game_instance.total_hits1})", True, (255, 255, 255))
-        agent2_text = font.render(f"Agent 2: {game_instance.score2} ({game_instance.total_hits2})", True, (255, 255, 255))
-        self.screen.blit(agent1_text, (bar_x - agent1_text.get_width() - 5, bar_y + (bar_height - agent1_text.get_height()) // 2))
-        self.screen.blit(agent2_text, (bar_x + bar_width + 5, bar_y + (bar_height - agent2_text.get_height()) // 2))
+        # Draw labels; they can reach past the game area, so their regions are tracked
+        label_size = int(bar_height * 0.8)
+        agent1_label = f"Agent 1: {game_instance.score1} ({game_instance.total_hits1})"
+        agent2_label = f"Agent 2: {game_instance.score2} ({game_instance.total_hits2})"
+        agent1_text = self.text_cache.render(agent1_label, (255, 255, 255), label_size)
+        agent2_text = self.text_cache.render(agent2_label, (255, 255, 255), label_size)
+        self.blit_tracked("performance1", agent1_text, (bar_x - agent1_text.get_width() - 5, bar_y + (bar_height - agent1_text.get_height()) // 2), agent1_label)
+        self.blit_tracked("performance2", agent2_text, (bar_x + bar_width + 5, bar_y + (bar_height - agent2_text.get_height()) // 2), agent2_label)
 
         # Draw percentage text
         percentage_text = f"{performance_ratio * 100:.1f}% - {100 - performance_ratio * 100:.1f}%"
-        percentage_surface = font.render(percentage_text, True, (255, 255, 255))
+        percentage_surface = self.text_cache.render(percentage_text, (255, 255, 255), label_size)
         percentage_rect = percentage_surface.get_rect(center=(bar_x + bar_width // 2, bar_y + bar_height + 5))
         self.screen.blit(percentage_surface, percentage_rect)
@@ -1,63 +1,67 @@
 import pygame
-import torch
-import torch.nn as nn
 import numpy as np
 
 class NetworkVisualizer:
     def __init__(self, screen, font):
         self.screen = screen
         self.font = font
+        self.node_radius = 5
+        self.edge_color = (100, 100, 100, 255)  # Line color for a node at zero activation
+        self.default_node_color = (200, 200, 200)
+        # The edges only depend on the network shape and the area size, so they are
+        # rendered once and reused until one of those changes
+        self.layout_key = None
+        self.edge_surface = None
+        self.node_positions = []
 
     def draw_network(self, network, activations, game_area):
-        # Create a transparent surface for the network visualization
-        network_surface = pygame.Surface(game_area.size, pygame.SRCALPHA)
-        
-        layers = [module for module in network.modules() if isinstance(module, torch.nn.Linear)]
+        # Duck-typed so the UI does not need to import torch
+        layers = [module for module in network.modules() if hasattr(module, "in_features")]
         layer_sizes = [layer.in_features for layer in layers] + [layers[-1].out_features]
 
-        width, height = game_area.size
+        layout_key = (tuple(layer_sizes), game_area.size)
+        if layout_key != self.layout_key:
+            self.build_layout(layer_sizes, game_area.size)
+            self.layout_key = layout_key
+
+        self.screen.blit(self.edge_surface, game_area.topleft)
+
+        offset_x, offset_y = game_area.topleft
+        for i, positions in enumerate(self.node_positions):
+            if activations is not None and i < len(activations):
+                colors = self.get_colors_from_activations(self.to_numpy(activations[i])[0], len(positions))
+            else:
+                colors = [self.default_node_color] * len(positions)
+            for (node_x, node_y), color in zip(positions, colors):
+                pygame.draw.circle(self.screen, color, (node_x + offset_x, node_y + offset_y), self.node_radius)
+
+    def build_layout(self, layer_sizes, size):
+        width, height = size
         vertical_spacing = height / (len(layer_sizes) - 1)
-        
+
+        self.node_positions = []
         for i, layer_size in enumerate(layer_sizes):
-            layer_y = i * vertical_spacing
             horizontal_spacing = width / (layer_size + 1)
-            
-            for j in range(layer_size):
-                node_x = (j + 1) * horizontal_spacing
-                node_y = layer_y
-                
-                # Calculate color based on activation
-                if i < len(activations) and j < activations[i].shape[1]:
-                    activation = activations[i][0][j].item()
-                    color = self.get_color_from_activation(activation)
-                else:
-                    color = (200, 200, 200, 255)  # Default color
-                
-                pygame.draw.circle(network_surface, color, (int(node_x), int(node_y)), 5)
-                
-                if i < len(layer_sizes) - 1:
-                    next_layer_y = (i + 1) * vertical_spacing
-                    next_layer_size = layer_sizes[i + 1]
-                    next_horizontal_spacing = width / (next_layer_size + 1)
-                    
-                    for k in range(next_layer_size):
-                        next_node_x = (k + 1) * next_horizontal_spacing
-                        next_node_y = next_layer_y
-                        line_color = self.get_line_color(color, (200, 200, 200, 255))
-                        pygame.draw.line(network_surface, line_color, 
-                                         (int(node_x), int(node_y)), 
-                                         (int(next_node_x), int(next_node_y)), 1)
-
-        # Blit the network surface onto the game area
-        self.screen.blit(network_surface, game_area.topleft)
-
-    def get_color_from_activation(self, activation):
+            layer_y = int(i * vertical_spacing)
+            self.node_positions.append([(int((j + 1) * horizontal_spacing), layer_y) for j in range(layer_size)])
+
+        self.edge_surface = pygame.Surface(size, pygame.SRCALPHA)
+        for positions, next_positions in zip(self.node_positions, self.node_positions[1:]):
+            for start in positions:
+                for end in next_positions:
+                    pygame.draw.line(self.edge_surface, self.edge_color, start, end, 1)
+
+    def to_numpy(self, activation):
+        if hasattr(activation, "cpu"):
+            activation = activation.cpu().numpy()
+        return np.asarray(activation)
+
+    def get_colors_from_activations(self, activations, count):
         # Map activation to color: blue for negative, red for positive
-        if activation < 0:
-            return (0, 0, min(255, int(-activation * 255)), 255)
-        else:
-            return (min(255, int(activation * 255)), 0, 0, 255)
-
-    def get_line_color(self, start_color, end_color):
-        # Create a gradient color for the line
-        return tuple((start + end) // 2 for start, end in zip(start_color, end_color))
+        colors = np.full((count, 3), self.default_node_color, dtype=np.int64)
+        values = activations[:count]
+        scaled = np.minimum(np.abs(values) * 255, 255).astype(np.int64)
+        colors[:len(values)] = 0
+        colors[:len(values), 0] = np.where(values >= 0, scaled, 0)
+        colors[:len(values), 2] = np.where(values < 0, scaled, 0)
+        return colors.tolist()
@@ -0,0 +1,30 @@
+import pygame
+from collections import OrderedDict
+
+# LRU cache of rendered text surfaces keyed by (text, color, size). Passing
+# size=None renders with the default font given at construction.
+class TextCache:
+    def __init__(self, default_font, max_entries=256):
+        self.default_font = default_font
+        self.max_entries = max_entries
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+
+    def get_font(self, size):
+        if size is None:
+            return self.default_font
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.Font(None, size)
+        return self.fonts[size]
+
+    def render(self, text, color, size=None):
+        key = (text, color, size)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = self.get_font(size).render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
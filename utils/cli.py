@@ -0,0 +1,9 @@
+import argparse
+
+# argparse types shared by the command-line entry points
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
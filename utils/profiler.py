@@ -0,0 +1,81 @@
+import json
+import time
+from collections import deque
+import numpy as np
+
+# Per-phase wall-clock timers. Instrumented code brackets a phase with
+#     start = profiler.start()
+#     ...
+#     profiler.stop("phase", start)
+# While disabled start() returns None and stop() returns immediately, so the
+# timers can stay in place at the cost of two calls per phase.
+class Profiler:
+    def __init__(self, window=600):
+        self.enabled = False
+        self.window = window  # Samples kept per phase for the rolling statistics
+        self.samples = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def start(self):
+        if self.enabled:
+            return time.perf_counter()
+        return None
+
+    def stop(self, phase, start):
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        samples = self.samples.get(phase)
+        if samples is None:
+            samples = self.samples[phase] = deque(maxlen=self.window)
+        samples.append(elapsed)
+
+    def reset(self):
+        self.samples.clear()
+
+    def summary(self):
+        # Rolling statistics per phase in milliseconds, in first-recorded order
+        summary = {}
+        for phase, samples in self.samples.items():
+            values = np.fromiter(samples, dtype=np.float64, count=len(samples)) * 1000
+            if not len(values):
+                continue
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            summary[phase] = {
+                'count': len(values),
+                'mean_ms': float(values.mean()),
+                'p50_ms': float(p50),
+                'p95_ms': float(p95),
+                'p99_ms': float(p99),
+                'max_ms': float(values.max()),
+            }
+        return summary
+
+    def histogram(self, phase, bins=20):
+        # Counts of the phase's recent samples over log-spaced millisecond bins
+        values = np.fromiter(self.samples.get(phase, ()), dtype=np.float64) * 1000
+        if not len(values):
+            return [], []
+        edges = np.logspace(np.log10(max(values.min(), 1e-4)), np.log10(max(values.max(), 1e-3)), bins + 1)
+        counts, edges = np.histogram(values, bins=edges)
+        return counts.tolist(), edges.tolist()
+
+    def export(self, filename):
+        report = {
+            'window': self.window,
+            'phases': self.summary(),
+            'histograms': {phase: dict(zip(('counts', 'edges_ms'), self.histogram(phase))) for phase in self.samples},
+        }
+        with open(filename, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    def format_summary(self):
+        return [f"{phase:24s} {stats['mean_ms']:8.3f} ms  p95 {stats['p95_ms']:8.3f} ms  (n={stats['count']})"
+                for phase, stats in self.summary().items()]
+
+profiler = Profiler()
@@ -1,14 +1,60 @@
 import pygame
 
+# Physics runs in a fixed world of width x height units, independent of the window;
+# GameUI scales the world to whatever game area it has when drawing
 class Settings:
-    def __init__(self, screen_width, screen_height):
-        self.width = screen_width
-        self.height = screen_height
-        self.paddle_width = int(screen_width * 0.015)
-        self.paddle_height = int(screen_height * 0.15)
-        self.ball_size = int(min(screen_width, screen_height) * 0.02)
-        self.ball_speed = int(min(screen_width, screen_height) * 0.01)
-        self.paddle_speed = int(screen_height * 0.01)
+    def __init__(self, width=800, height=600):
+        self.width = width
+        self.height = height
+        self.paddle_width = int(width * 0.015)
+        self.paddle_height = int(height * 0.15)
+        self.ball_size = int(min(width, height) * 0.02)
+        self.ball_speed = int(min(width, height) * 0.01)
+        self.paddle_speed = int(height * 0.01)
+        self.hidden_size = 64  # Width of the DQN hidden layers
+
+        # Replay insertion: "max" gives new transitions the current max priority and lets the
+        # learner's batched pass assign real TD errors; "batched" additionally recomputes the
+        # priorities of new transitions in one forward pass every priority_update_interval steps
+        self.priority_mode = "max"
+        self.priority_update_interval = 32
+
+        # Replay capacity per agent. With replay_path set, each agent's buffer lives in
+        # memory-mapped files under replay_path/agentN that are reopened on restart
+        self.replay_capacity = 10000
+        self.replay_path = None
+
+        # Learner schedule: every train_frequency env steps the agent runs gradient_steps
+        # optimizer steps. target_update_mode "hard" copies policy_net into target_net every
+        # target_update_interval env steps; "soft" blends it in with factor tau after each
+        # gradient step
+        self.train_frequency = 1
+        self.gradient_steps = 1
+        self.target_update_mode = "hard"
+        self.target_update_interval = 1000
+        self.tau = 0.005
+
+        # Physics ticks each agent decision is held for; rewards over those ticks are
+        # summed into a single transition
+        self.frame_skip = 1
+
+        # Acting forward pass: "torch" runs policy_net, "numpy" runs a NumpyPolicy view
+        # of it, which is several times faster for single observations on CPU, and
+        # "int8" runs a dynamically quantized copy (acting-only ActorAgents; the
+        # learning Agent treats it as "torch")
+        self.inference_backend = "torch"
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data):
+        settings = cls(data['width'], data['height'])
+        if 'hidden_size' not in data:
+            # Older saves sized the network from the world dimensions
+            settings.hidden_size = int(min(data['width'], data['height']) * 0.1)
+        settings.__dict__.update(data)
+        return settings
 
     def show_settings_menu(self, screen, font):
         settings = [
@@ -25,7 +71,7 @@ class Settings:
             for i, (name, attr, min_val, max_val) in enumerate(settings):
                 color = (255, 255, 255) if i == selected else (150, 150, 150)
                 text = font.render(f"{name}: {getattr(self, attr)}", True, color)
-                screen.blit(text, (int(self.width * 0.1), int(self.height * 0.1 + i * self.height * 0.1)))
+                screen.blit(text, (int(screen.get_width() * 0.1), int(screen.get_height() * (0.1 + i * 0.1))))
 
             pygame.display.flip()
 